@@ -0,0 +1,198 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import cv2 as cv
+import numpy as np
+
+
+class MotionGate:
+    """
+    Portão de movimento: decide, a partir de um buffer de baixa resolução, se o
+    quadro atual precisa passar pela detecção de pessoas e, quando possível,
+    restringe a detecção à região onde houve movimento
+    """
+
+    def __init__(self,
+                 buffer_width=160,
+                 buffer_height=90,
+                 method='diff',
+                 learning_rate=0.05,
+                 pixel_threshold=25,
+                 motion_threshold=0.002,
+                 min_region_area=4,
+                 region_margin=0.25,
+                 max_region_fraction=0.6,
+                 max_skip_frames=30):
+        """
+        Inicialização da classe
+        :param buffer_width: largura do buffer de baixa resolução
+        :param buffer_height: altura do buffer de baixa resolução
+        :param method: 'diff' (diferença contra fundo médio) ou 'mog2' (cv.createBackgroundSubtractorMOG2)
+        :param learning_rate: taxa de atualização do fundo médio (método 'diff')
+        :param pixel_threshold: diferença mínima de intensidade para um pixel ser considerado em movimento
+        :param motion_threshold: fração mínima de pixels em movimento para o quadro ter movimento
+        :param min_region_area: área mínima (em pixels do buffer) de uma região de movimento
+        :param region_margin: margem adicionada à região de movimento, relativa ao seu tamanho
+        :param max_region_fraction: acima desta fração do quadro, a detecção roda no quadro inteiro
+        :param max_skip_frames: máximo de quadros pulados seguidos; depois disso a detecção roda
+                                no quadro inteiro (quadro-chave), mesmo sem movimento. None desliga
+        """
+        if method not in ('diff', 'mog2'):
+            raise ValueError("Método de detecção de movimento desconhecido: {}".format(method))
+        if max_skip_frames is not None and max_skip_frames < 0:
+            raise ValueError("max_skip_frames deve ser não negativo: {}".format(max_skip_frames))
+
+        self.__buffer_size = (buffer_width, buffer_height)
+        self.__method = method
+        self.__learning_rate = learning_rate
+        self.__pixel_threshold = pixel_threshold
+        self.__motion_threshold = motion_threshold
+        self.__min_region_area = min_region_area
+        self.__region_margin = region_margin
+        self.__max_region_fraction = max_region_fraction
+        self.__max_skip_frames = max_skip_frames
+
+        # buffers alocados uma única vez - o processamento por quadro não aloca memória nova
+
+        self.__small = np.zeros((buffer_height, buffer_width, 3), dtype=np.uint8)
+        self.__gray = np.zeros((buffer_height, buffer_width), dtype=np.uint8)
+        self.__difference = np.zeros((buffer_height, buffer_width), dtype=np.float32)
+        self.__mask = np.zeros((buffer_height, buffer_width), dtype=bool)
+        self.__background = None
+
+        if method == 'mog2':
+            self.__subtractor = cv.createBackgroundSubtractorMOG2(detectShadows=False)
+        else:
+            self.__subtractor = None
+
+        self.__frames = 0
+        self.__skipped = 0
+        self.__consecutive_skips = 0
+        self.__keyframes = 0
+        self.__motion_fraction = 1.0
+
+    def __update_mask(self, frame):
+        """
+        Atualiza a máscara de movimento a partir do quadro
+        :param frame: quadro RGB em resolução original
+        :return: True se existe referência de fundo para comparação
+        """
+        cv.resize(frame, self.__buffer_size, dst=self.__small, interpolation=cv.INTER_LINEAR)
+        cv.cvtColor(self.__small, cv.COLOR_RGB2GRAY, dst=self.__gray)
+
+        if self.__subtractor is not None:
+            np.greater(self.__subtractor.apply(self.__gray), 0, out=self.__mask)
+            has_reference = self.__frames > 1
+        elif self.__background is None:
+            self.__background = self.__gray.astype(np.float32)
+            has_reference = False
+        else:
+            np.subtract(self.__gray, self.__background, out=self.__difference)
+            np.abs(self.__difference, out=self.__difference)
+            np.greater(self.__difference, self.__pixel_threshold, out=self.__mask)
+            cv.accumulateWeighted(self.__gray, self.__background, self.__learning_rate)
+            has_reference = True
+
+        return has_reference
+
+    def __motion_region(self, width, height):
+        """
+        Região (união das componentes de movimento) em coordenadas do quadro original
+        :param width: largura do quadro original
+        :param height: altura do quadro original
+        :return: (left, top, right, bottom) ou None se o quadro inteiro deve ser processado
+        """
+        count, labels, stats, centroids = cv.connectedComponentsWithStats(self.__mask.view(np.uint8),
+                                                                         connectivity=8)
+        # o rótulo 0 é o fundo
+        stats = stats[1:]
+        stats = stats[stats[:, cv.CC_STAT_AREA] >= self.__min_region_area]
+        if len(stats) == 0:
+            return None
+
+        left = stats[:, cv.CC_STAT_LEFT].min()
+        top = stats[:, cv.CC_STAT_TOP].min()
+        right = (stats[:, cv.CC_STAT_LEFT] + stats[:, cv.CC_STAT_WIDTH]).max()
+        bottom = (stats[:, cv.CC_STAT_TOP] + stats[:, cv.CC_STAT_HEIGHT]).max()
+
+        scale_x = width / self.__buffer_size[0]
+        scale_y = height / self.__buffer_size[1]
+        margin_x = self.__region_margin * (right - left)
+        margin_y = self.__region_margin * (bottom - top)
+
+        left = max(0, int((left - margin_x) * scale_x))
+        top = max(0, int((top - margin_y) * scale_y))
+        right = min(width, int((right + margin_x) * scale_x))
+        bottom = min(height, int((bottom + margin_y) * scale_y))
+
+        if (right - left) * (bottom - top) > self.__max_region_fraction * width * height:
+            return None
+
+        return left, top, right, bottom
+
+    def process(self, frame, tracks_stable=True):
+        """
+        Avalia o quadro atual
+        :param frame: quadro RGB em resolução original
+        :param tracks_stable: True se nenhum rastreio está desaparecido
+        :return: (skip, region) - skip indica que a detecção pode ser pulada; region é a
+                 área de movimento (left, top, right, bottom) ou None para o quadro inteiro
+        """
+        self.__frames += 1
+
+        height, width = frame.shape[:2]
+
+        if not self.__update_mask(frame):
+            self.__motion_fraction = 1.0
+            self.__consecutive_skips = 0
+            return False, None
+
+        self.__motion_fraction = float(self.__mask.mean())
+
+        if self.__motion_fraction < self.__motion_threshold:
+            if not tracks_stable:
+                self.__consecutive_skips = 0
+                return False, None
+            # quadro-chave: limita a defasagem dos resultados reaproveitados e recupera
+            # pessoas paradas que a detecção anterior perdeu
+            if self.__max_skip_frames is not None and self.__consecutive_skips >= self.__max_skip_frames:
+                self.__consecutive_skips = 0
+                self.__keyframes += 1
+                return False, None
+            self.__consecutive_skips += 1
+            self.__skipped += 1
+            return True, None
+
+        self.__consecutive_skips = 0
+        return False, self.__motion_region(width, height)
+
+    def get_motion_fraction(self):
+        return self.__motion_fraction
+
+    def get_keyframe_count(self):
+        return self.__keyframes
+
+    def get_skip_ratio(self):
+        if self.__frames == 0:
+            return 0.0
+        return self.__skipped / self.__frames
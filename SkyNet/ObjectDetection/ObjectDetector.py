@@ -21,11 +21,13 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR TH
 OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy as np
 import tensorflow as tf
-from SkyNet.Utils import preprocess
+from SkyNet.Profiling.Tracer import NULL_TRACER
+from SkyNet.Utils import preprocess, tile_regions, BatchInterpreter
 
 
-def detect(interpreter, input_tensor):
+def detect(interpreter, input_tensor, tracer=NULL_TRACER):
 
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
@@ -36,11 +38,13 @@ def detect(interpreter, input_tensor):
         input_shape = input_tensor.shape
         interpreter.resize_tensor_input(
             input_tensor_index, input_shape, strict=True)
-    interpreter.allocate_tensors()
+    with tracer.span('detector.allocate_tensors'):
+        interpreter.allocate_tensors()
 
     interpreter.set_tensor(input_details[0]['index'], input_tensor.numpy())
 
-    interpreter.invoke()
+    with tracer.span('detector.invoke', batch_size=int(input_tensor.shape[0])):
+        interpreter.invoke()
 
     boxes = interpreter.get_tensor(output_details[0]['index'])
     classes = interpreter.get_tensor(output_details[1]['index'])
@@ -50,17 +54,36 @@ def detect(interpreter, input_tensor):
     return classes, boxes, scores
 
 
+def detection_outputs(interpreter, output_details):
+    """
+    Saídas do SSD
+    :param interpreter: tf.lite.Interpreter já invocado
+    :param output_details: detalhes das saídas
+    :return: classes, caixas e scores
+    """
+    boxes = interpreter.get_tensor(output_details[0]['index'])
+    classes = interpreter.get_tensor(output_details[1]['index'])
+    scores = interpreter.get_tensor(output_details[2]['index'])
+
+    return classes, boxes, scores
+
+
 class ObjectDetector:
     def __init__(self,
                  input_size,
-                 interpreter_file='models/ssd_mobilenet_v2.tflite'):
+                 interpreter_file='models/ssd_mobilenet_v2.tflite',
+                 tracer=NULL_TRACER):
         """
         Inicialização da classe
         :param input_size: o tamanho do quadro tratado pela Rede neural de classificação
         :param interpreter_file: o arquivo da cnn classificadora
+        :param tracer: Tracer para o rastreamento de desempenho
         """
         self.__input_size = input_size
+        self.__tracer = tracer
         self.__interpreter = tf.lite.Interpreter(model_path=interpreter_file)
+        # interpretador separado para o modo em mosaico e em lote
+        self.__batch_interpreter = BatchInterpreter(interpreter_file, detection_outputs, tracer, 'detector')
 
     def __classify(self, frame):
         """
@@ -69,7 +92,8 @@ class ObjectDetector:
         :return: classes, caixas delimitadoras e scores
         """
         classes, boxes, scores = detect(self.__interpreter,
-                                        frame)
+                                        frame,
+                                        self.__tracer)
 
         classes = classes[0]
 
@@ -138,3 +162,106 @@ class ObjectDetector:
                                                                                   boxes,
                                                                                   scores)
         return classes, classnames, centroids, boxes, scores
+
+    def run_tiled_detector(self,
+                           frame,
+                           width,
+                           height,
+                           tile_size=400,
+                           overlap=0.2,
+                           regions=None,
+                           include_full_frame=True,
+                           edge_margin=4):
+        """
+        Roda o detector em mosaico: o quadro (ou as regiões de interesse) é dividido em
+        ladrilhos quadrados sobrepostos, detectados em um único lote. Com a região inteira
+        no lote, detecções que tocam uma borda interna de ladrilho (pessoa cortada) são
+        descartadas: a pessoa inteira aparece em outro ladrilho ou na região inteira, e a
+        caixa parcial, às vezes com score maior, não deve suprimir a completa no NMS
+        :param frame: a imagem original
+        :param width: largura da imagem original
+        :param height: altura da imagem original
+        :param tile_size: lado do ladrilho, em pixels do quadro original
+        :param overlap: fração de sobreposição entre ladrilhos vizinhos, em [0, 1)
+        :param regions: regiões de interesse (left, top, right, bottom) - None para o quadro inteiro
+        :param include_full_frame: inclui cada região inteira no lote, para pessoas maiores que um ladrilho
+        :param edge_margin: distância (pixels) até a borda interna para a detecção ser considerada cortada
+        :return: classes, nomes, centróides, caixas e scores em coordenadas do quadro - ainda sem NMS
+        """
+        if regions is None:
+            regions = [(0, 0, width, height)]
+
+        tiles = list()
+        # por ladrilho: bordas (left, top, right, bottom) internas à área coberta
+        interior_edges = list()
+        for region in regions:
+            region_tiles = tile_regions(region, width, height, tile_size, overlap)
+            if include_full_frame and len(region_tiles) > 1:
+                # área coberta pelos ladrilhos - a região pode ter sido aumentada por ser estreita
+                lefts, tops, rights, bottoms = zip(*region_tiles)
+                covered = (min(lefts), min(tops), max(rights), max(bottoms))
+                tiles.extend(region_tiles)
+                interior_edges.extend([(l > covered[0], t > covered[1], r < covered[2], b < covered[3])
+                                       for (l, t, r, b) in region_tiles])
+                tiles.append(covered)
+                interior_edges.append((False, False, False, False))
+            else:
+                tiles.extend(region_tiles)
+                interior_edges.extend([(False, False, False, False)] * len(region_tiles))
+
+        if len(tiles) == 0:
+            return [], [], [], [], []
+
+        with self.__tracer.span('detector.preprocess', batch_size=len(tiles)):
+            batch = np.concatenate([preprocess(frame[t:b, l:r], self.__input_size).numpy()
+                                    for (l, t, r, b) in tiles])
+
+        batch_classes, batch_boxes, batch_scores = self.__batch_interpreter.run(batch)
+
+        new_classes = list()
+        new_classnames = list()
+        new_centroids = list()
+        new_boxes = list()
+        new_scores = list()
+
+        for i, (l, t, r, b) in enumerate(tiles):
+            classes, classnames, centroids, boxes, scores = self.__detection_cleanup(r - l,
+                                                                                    b - t,
+                                                                                    batch_classes[i],
+                                                                                    batch_boxes[i],
+                                                                                    batch_scores[i])
+            left_edge, top_edge, right_edge, bottom_edge = interior_edges[i]
+            for j, (x_min, y_min, x_max, y_max) in enumerate(boxes):
+                if (left_edge and x_min <= edge_margin) or \
+                        (top_edge and y_min <= edge_margin) or \
+                        (right_edge and x_max >= r - l - edge_margin) or \
+                        (bottom_edge and y_max >= b - t - edge_margin):
+                    continue
+                new_classes.append(classes[j])
+                new_classnames.append(classnames[j])
+                new_centroids.append([centroids[j][0] + l, centroids[j][1] + t])
+                new_boxes.append([x_min + l, y_min + t, x_max + l, y_max + t])
+                new_scores.append(scores[j])
+
+        return new_classes, new_classnames, new_centroids, new_boxes, new_scores
+
+    def run_batch_detector(self,
+                           frames):
+        """
+        Roda o detector em lote - um quadro por elemento do lote
+        :param frames: lista de imagens
+        :return: lista com (classes, nomes, centróides, caixas, scores) de cada imagem - sem NMS
+        """
+        batch = np.concatenate([preprocess(frame, self.__input_size).numpy() for frame in frames])
+
+        batch_classes, batch_boxes, batch_scores = self.__batch_interpreter.run(batch)
+
+        detections = list()
+        for i, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            detections.append(self.__detection_cleanup(width,
+                                                       height,
+                                                       batch_classes[i],
+                                                       batch_boxes[i],
+                                                       batch_scores[i]))
+        return detections
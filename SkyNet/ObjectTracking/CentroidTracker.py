@@ -10,6 +10,8 @@ class CentroidTracker():
         self.disappeared = OrderedDict()
         self.maxDisappeared = maxDisappeared
         self.bboxes = OrderedDict()
+        # índice, na lista de entrada, da detecção associada a cada objeto no último update
+        self.detections = OrderedDict()
 
     def register(self, centroid, bbox):
         self.objects[self.nextObjectID] = centroid
@@ -27,7 +29,12 @@ class CentroidTracker():
         self.bboxes[objectID] = bbox
         self.disappeared[objectID] = 0
 
+    def is_stable(self):
+        return all(count == 0 for count in self.disappeared.values())
+
     def update_tracks(self, rects):
+        self.detections = OrderedDict()
+
         if len(rects) == 0:
             for objectID in self.objects.keys():
                 self.disappeared[objectID] += 1
@@ -37,15 +44,12 @@ class CentroidTracker():
 
             return self.objects, self.bboxes
 
-        inputCentroids = np.zeros((len(rects), 2), dtype="int")
-
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            inputCentroids[i] = (cX, cY)
+        boxes = np.asarray(rects)
+        inputCentroids = ((boxes[:, 0:2] + boxes[:, 2:4]) / 2.0).astype("int")
 
         if len(self.objects) == 0:
             for i in range(0, len(inputCentroids)):
+                self.detections[self.nextObjectID] = i
                 self.register(inputCentroids[i], rects[i])
         else:
             objectIDs = list(self.objects.keys())
@@ -66,6 +70,7 @@ class CentroidTracker():
                 self.objects[objectID] = inputCentroids[col]
                 self.bboxes[objectID] = rects[col]
                 self.disappeared[objectID] = 0
+                self.detections[objectID] = col
 
                 usedRows.add(row)
                 usedCols.add(col)
@@ -83,6 +88,7 @@ class CentroidTracker():
                         self.deregister(objectID)
             else:
                 for col in unusedCols:
+                    self.detections[self.nextObjectID] = col
                     self.register(inputCentroids[col], rects[col])
 
         return self.objects, self.bboxes
\ No newline at end of file
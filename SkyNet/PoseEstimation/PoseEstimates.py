@@ -59,3 +59,53 @@ class PoseEstimates:
 
     def get_scores(self):
         return self.__scores
+
+
+class MultiPoseEstimates:
+    """
+    Conteiner vetorizado das pessoas detectadas pela Movenet Multipose:
+    caixas delimitadoras, scores e pontos chave de todas as pessoas do quadro
+    """
+
+    def __init__(self,
+                 multipose_output,
+                 offset_width,
+                 offset_height,
+                 image_width,
+                 image_height,
+                 score_threshold=0.2):
+        # cada linha: 17 x (y, x, score), caixa (ymin, xmin, ymax, xmax) e score da pessoa
+        people = np.reshape(multipose_output, (-1, 56))
+        people = people[people[:, 55] >= score_threshold]
+
+        scale = np.array([image_height, image_width], dtype=np.float32)
+        offset = np.array([offset_height, offset_width], dtype=np.float32)
+
+        keypoints = np.reshape(people[:, :51], (-1, 17, 3)).copy()
+        raw_points = keypoints.copy()
+        raw_points[:, :, :2] = raw_points[:, :, :2] * scale
+        keypoints[:, :, :2] = raw_points[:, :, :2] + offset
+
+        corners = np.reshape(people[:, 51:55], (-1, 2, 2)) * scale + offset
+        # (ymin, xmin), (ymax, xmax) -> (left, top, right, bottom)
+        boxes = corners[:, :, ::-1].reshape(-1, 4).astype(int)
+
+        self.__boxes = boxes
+        self.__scores = people[:, 55]
+        self.__points = keypoints
+        self.__raw_points = raw_points
+
+    def __len__(self):
+        return len(self.__scores)
+
+    def get_boxes(self):
+        return self.__boxes
+
+    def get_points(self):
+        return self.__points
+
+    def get_raw_points(self):
+        return self.__raw_points
+
+    def get_scores(self):
+        return self.__scores
@@ -24,11 +24,12 @@ OR OTHER DEALINGS IN THE SOFTWARE.
 import numpy as np
 import tensorflow as tf
 import cv2 as cv
-from .PoseEstimates import PoseEstimates
-from SkyNet.Utils import preprocess
+from .PoseEstimates import PoseEstimates, MultiPoseEstimates
+from SkyNet.Profiling.Tracer import NULL_TRACER
+from SkyNet.Utils import preprocess, BatchInterpreter
 
 
-def detect(interpreter, input_tensor):
+def detect(interpreter, input_tensor, tracer=NULL_TRACER):
     """Runs detection on an input image.
 
   Args:
@@ -49,32 +50,50 @@ def detect(interpreter, input_tensor):
         input_shape = input_tensor.shape
         interpreter.resize_tensor_input(
             input_tensor_index, input_shape, strict=True)
-    interpreter.allocate_tensors()
+    with tracer.span('pose.allocate_tensors'):
+        interpreter.allocate_tensors()
 
     interpreter.set_tensor(input_details[0]['index'], input_tensor.numpy())
 
-    interpreter.invoke()
+    with tracer.span('pose.invoke', batch_size=int(input_tensor.shape[0])):
+        interpreter.invoke()
 
     keypoints_with_scores = interpreter.get_tensor(output_details[0]['index'])
     return keypoints_with_scores
 
 
+def pose_outputs(interpreter, output_details):
+    """
+    Saída da Movenet
+    :param interpreter: tf.lite.Interpreter já invocado
+    :param output_details: detalhes das saídas
+    :return: tupla com os pontos chave
+    """
+    return (interpreter.get_tensor(output_details[0]['index']),)
+
+
 class PoseEstimation:
     """
-    Estimação de Postura utilizando a Movenet Multipose
+    Estimação de Postura utilizando a Movenet Singlepose (por recorte) ou
+    Movenet Multipose (todas as pessoas do quadro em uma única inferência)
 
     """
 
     def __init__(self,
                  input_size,
-                 interpreter_file='models/singlepose_movenet.tflite'):
+                 interpreter_file='models/singlepose_movenet.tflite',
+                 tracer=NULL_TRACER):
         """
         Inicialização da classe
         :param input_size: o tamanho do quadro tratado pela Rede neural de classificação
         :param interpreter_file: o arquivo
+        :param tracer: Tracer para o rastreamento de desempenho
         """
         self.__input_size = input_size
+        self.__tracer = tracer
         self.__interpreter = tf.lite.Interpreter(model_path=interpreter_file)
+        # interpretador separado para lotes
+        self.__batch_interpreter = BatchInterpreter(interpreter_file, pose_outputs, tracer, 'pose')
 
     def __classify(self, frame):
         """
@@ -83,7 +102,8 @@ class PoseEstimation:
         :return: os pontos chave e a caixa delimitadora
         """
         keypoints_with_scores = detect(self.__interpreter,
-                                       frame)
+                                       frame,
+                                       self.__tracer)
 
         return keypoints_with_scores
 
@@ -110,3 +130,51 @@ class PoseEstimation:
                              image_width=width,
                              image_height=height)
         return pose
+
+    def run_multipose_estimator(self,
+                                frame,
+                                offset_width,
+                                offset_height,
+                                width,
+                                height,
+                                score_threshold=0.2):
+        """
+        Roda o estimador Movenet Multipose - uma inferência para até 6 pessoas
+        :param frame: a imagem original (ou região dela)
+        :param offset_height: offset da região na imagem original
+        :param offset_width: offset da região na imagem original
+        :param height: altura da região
+        :param width: largura da região
+        :param score_threshold: score mínimo de uma pessoa
+        :return: MultiPoseEstimates com caixas, scores e pontos chave de todas as pessoas
+        """
+        img = preprocess(frame, self.__input_size)
+        keypoints = self.__classify(img)
+        poses = MultiPoseEstimates(keypoints,
+                                   offset_width=offset_width,
+                                   offset_height=offset_height,
+                                   image_width=width,
+                                   image_height=height,
+                                   score_threshold=score_threshold)
+        return poses
+
+    def run_batch_estimator(self,
+                            frames,
+                            offsets):
+        """
+        Roda o estimador em lote
+        :param frames: lista de recortes
+        :param offsets: lista de (offset_width, offset_height) de cada recorte
+        :return: lista de PoseEstimates, na ordem dos recortes
+        """
+        batch = np.concatenate([preprocess(frame, self.__input_size).numpy() for frame in frames])
+        keypoints, = self.__batch_interpreter.run(batch)
+        poses = list()
+        for frame, (offset_width, offset_height), keypoints_with_scores in zip(frames, offsets, keypoints):
+            height, width = frame.shape[:2]
+            poses.append(PoseEstimates(keypoints_with_scores,
+                                       offset_width=offset_width,
+                                       offset_height=offset_height,
+                                       image_width=width,
+                                       image_height=height))
+        return poses
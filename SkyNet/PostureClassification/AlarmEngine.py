@@ -0,0 +1,107 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from collections import OrderedDict
+from .PostureClassifier import FEATURE_NAMES, POSTURE_LABELS, UNKNOWN_POSTURE
+
+LYING = POSTURE_LABELS.index('deitado')
+
+
+class AlarmEngine:
+    """
+    Lógica de alarmes por regras, avaliada sobre todos os rastreios de uma vez.
+    O estado de cada regra é mantido em arrays indexados pelo slot do rastreio
+    """
+
+    def __init__(self,
+                 max_tracks=32,
+                 fall_velocity=0.8,
+                 fall_cooldown=5.0,
+                 lying_seconds=10.0):
+        """
+        Inicialização da classe
+        :param max_tracks: número máximo de rastreios simultâneos (slots)
+        :param fall_velocity: velocidade de descida do quadril (alturas de quadro/s) que caracteriza queda
+        :param fall_cooldown: intervalo mínimo (s) entre dois alarmes de queda do mesmo rastreio
+        :param lying_seconds: tempo (s) deitado até disparar o alarme
+        """
+        self.__fall_velocity = fall_velocity
+        self.__fall_cooldown = fall_cooldown
+        self.__lying_seconds = lying_seconds
+        self.__velocity_y = FEATURE_NAMES.index('velocity_y')
+        self.__last_fall = np.full(max_tracks, -np.inf)
+        self.__lying_since = np.full(max_tracks, np.nan)
+        self.__lying_alarmed = np.zeros(max_tracks, dtype=bool)
+        self.__rules = OrderedDict()
+
+    def add_rule(self, name, rule):
+        """
+        Acrescenta uma regra de alarme
+        :param name: nome do alarme
+        :param rule: função (features, labels) -> máscara booleana [T]
+        :return: None
+        """
+        self.__rules[name] = rule
+
+    def reset(self, slots):
+        """
+        Limpa o estado dos slots liberados
+        :param slots: slots liberados
+        :return: None
+        """
+        self.__last_fall[slots] = -np.inf
+        self.__lying_since[slots] = np.nan
+        self.__lying_alarmed[slots] = False
+
+    def evaluate(self, slots, timestamp, features, labels):
+        """
+        Avalia todas as regras
+        :param slots: slot de cada rastreio [T]
+        :param timestamp: instante do quadro (s)
+        :param features: matriz de características [T, len(FEATURE_NAMES)]
+        :param labels: postura de cada rastreio [T]
+        :return: OrderedDict nome do alarme -> máscara booleana [T]
+        """
+        lying = labels == LYING
+        unknown = labels == UNKNOWN_POSTURE
+
+        # queda: descida rápida do quadril terminando com a pessoa deitada
+        fall = lying & \
+            (features[:, self.__velocity_y] > self.__fall_velocity) & \
+            (timestamp - self.__last_fall[slots] > self.__fall_cooldown)
+        self.__last_fall[slots[fall]] = timestamp
+
+        # deitado por muito tempo - postura indefinida não interrompe a contagem
+        since = self.__lying_since[slots]
+        since = np.where(lying, np.where(np.isnan(since), timestamp, since), np.where(unknown, since, np.nan))
+        self.__lying_since[slots] = since
+        lying_too_long = lying & (timestamp - since >= self.__lying_seconds) & ~self.__lying_alarmed[slots]
+        self.__lying_alarmed[slots] = np.where(lying | unknown, self.__lying_alarmed[slots] | lying_too_long, False)
+
+        alarms = OrderedDict()
+        alarms['queda'] = fall
+        alarms['deitado por muito tempo'] = lying_too_long
+        for name, rule in self.__rules.items():
+            alarms[name] = np.asarray(rule(features, labels), dtype=bool)
+        return alarms
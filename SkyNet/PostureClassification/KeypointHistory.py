@@ -0,0 +1,109 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from collections import OrderedDict
+
+
+class KeypointHistory:
+    """
+    Histórico de pontos chave por rastreio: buffer circular NumPy de tamanho fixo,
+    alocado uma única vez e indexado por slot. Cada rastreio ocupa um slot, que é
+    liberado (e reutilizado) quando o rastreio deixa de existir
+    """
+
+    def __init__(self, max_tracks=32, history_length=30):
+        """
+        Inicialização da classe
+        :param max_tracks: número máximo de rastreios simultâneos
+        :param history_length: número de quadros guardados por rastreio
+        """
+        self.__history_length = history_length
+        self.__keypoints = np.zeros((max_tracks, history_length, 17, 3), dtype=np.float32)
+        self.__boxes = np.zeros((max_tracks, history_length, 4), dtype=np.float32)
+        self.__timestamps = np.zeros((max_tracks, history_length), dtype=np.float64)
+        # próxima posição de escrita e número de quadros válidos de cada slot
+        self.__heads = np.zeros(max_tracks, dtype=np.int64)
+        self.__counts = np.zeros(max_tracks, dtype=np.int64)
+        self.__slots = OrderedDict()
+        self.__free_slots = list(range(max_tracks - 1, -1, -1))
+
+    def sync(self, track_ids):
+        """
+        Libera os slots dos rastreios que não existem mais
+        :param track_ids: ids dos rastreios ativos
+        :return: array com os slots liberados
+        """
+        active = set(track_ids)
+        released = [objectID for objectID in self.__slots.keys() if objectID not in active]
+        slots = np.array([self.__slots.pop(objectID) for objectID in released], dtype=np.int64)
+        self.__counts[slots] = 0
+        self.__heads[slots] = 0
+        self.__free_slots.extend(slots.tolist())
+        return slots
+
+    def update(self, timestamp, track_ids, keypoints, boxes):
+        """
+        Acrescenta um quadro ao histórico de todos os rastreios de uma vez
+        :param timestamp: instante do quadro (segundos)
+        :param track_ids: ids dos rastreios [T]
+        :param keypoints: pontos chave normalizados [T, 17, 3]
+        :param boxes: caixas normalizadas [T, 4]
+        :return: slot de cada rastreio [T] - -1 se não há slot livre
+        """
+        slots = np.empty(len(track_ids), dtype=np.int64)
+        for i, objectID in enumerate(track_ids):
+            if objectID not in self.__slots and len(self.__free_slots) > 0:
+                self.__slots[objectID] = self.__free_slots.pop()
+            slots[i] = self.__slots.get(objectID, -1)
+
+        valid = slots >= 0
+        slots = slots[valid]
+        heads = self.__heads[slots]
+
+        self.__keypoints[slots, heads] = keypoints[valid]
+        self.__boxes[slots, heads] = boxes[valid]
+        self.__timestamps[slots, heads] = timestamp
+
+        self.__heads[slots] = (heads + 1) % self.__history_length
+        self.__counts[slots] = np.minimum(self.__counts[slots] + 1, self.__history_length)
+
+        result = np.full(len(track_ids), -1, dtype=np.int64)
+        result[valid] = slots
+        return result
+
+    def get_frames(self, slots, lag=0):
+        """
+        Quadro de cada slot com atraso `lag` - limitado ao quadro mais antigo disponível
+        :param slots: slots consultados [T]
+        :param lag: atraso em quadros (0 é o quadro mais recente)
+        :return: keypoints [T, 17, 3], boxes [T, 4], timestamps [T]
+        """
+        lags = np.minimum(lag, self.__counts[slots] - 1)
+        positions = (self.__heads[slots] - 1 - lags) % self.__history_length
+        return (self.__keypoints[slots, positions],
+                self.__boxes[slots, positions],
+                self.__timestamps[slots, positions])
+
+    def get_counts(self, slots):
+        return self.__counts[slots]
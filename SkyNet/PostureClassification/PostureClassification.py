@@ -0,0 +1,115 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from .KeypointHistory import KeypointHistory
+from .PostureClassifier import RulePostureClassifier, posture_features, POSTURE_LABELS, UNKNOWN_POSTURE
+from .AlarmEngine import AlarmEngine
+
+
+def posture_name(label):
+    """
+    Nome da postura
+    :param label: índice em POSTURE_LABELS ou UNKNOWN_POSTURE
+    :return: nome da postura
+    """
+    if label == UNKNOWN_POSTURE:
+        return 'indefinido'
+    return POSTURE_LABELS[label]
+
+
+class PostureClassification:
+    """
+    Classificação de postura, de movimento e lógica de alarmes sobre o histórico
+    de pontos chave de todos os rastreios, em lote
+    """
+
+    def __init__(self,
+                 max_tracks=32,
+                 history_length=30,
+                 velocity_lag=5,
+                 classifier=None,
+                 alarm_engine=None):
+        """
+        Inicialização da classe
+        :param max_tracks: número máximo de rastreios simultâneos
+        :param history_length: número de quadros guardados por rastreio
+        :param velocity_lag: distância, em quadros, usada no cálculo das velocidades
+        :param classifier: objeto com predict(X) (ex.: scikit-learn) - RulePostureClassifier por padrão
+        :param alarm_engine: AlarmEngine - criado com os parâmetros padrão se None
+        """
+        self.__history = KeypointHistory(max_tracks, history_length)
+        self.__velocity_lag = velocity_lag
+        self.__classifier = classifier if classifier is not None else RulePostureClassifier()
+        self.__alarm_engine = alarm_engine if alarm_engine is not None else AlarmEngine(max_tracks)
+
+    def run_classifier(self,
+                       timestamp,
+                       track_ids,
+                       keypoints,
+                       boxes,
+                       frame_height):
+        """
+        Roda o classificador sobre o quadro atual
+        :param timestamp: instante do quadro (s)
+        :param track_ids: ids dos rastreios ativos [T]
+        :param keypoints: pontos chave em pixels [T, 17, 3] (y, x, score)
+        :param boxes: caixas em pixels [T, 4] (left, top, right, bottom)
+        :param frame_height: altura do quadro - escala da normalização
+        :return: postura de cada rastreio [T] e lista de alarmes (track_id, nome)
+        """
+        released = self.__history.sync(track_ids)
+        self.__alarm_engine.reset(released)
+
+        labels = np.full(len(track_ids), UNKNOWN_POSTURE, dtype=np.int64)
+        if len(track_ids) == 0:
+            return labels, []
+
+        # normalização isotrópica pela altura do quadro
+        keypoints = np.array(keypoints, dtype=np.float32).reshape(-1, 17, 3)
+        keypoints[:, :, :2] /= frame_height
+        boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4) / frame_height
+
+        slots = self.__history.update(timestamp, track_ids, keypoints, boxes)
+        valid = slots >= 0
+        slots = slots[valid]
+        if len(slots) == 0:
+            return labels, []
+
+        previous_keypoints, previous_boxes, previous_timestamps = self.__history.get_frames(slots,
+                                                                                             self.__velocity_lag)
+
+        features = posture_features(keypoints[valid],
+                                    boxes[valid],
+                                    previous_keypoints,
+                                    timestamp - previous_timestamps)
+
+        labels[valid] = self.__classifier.predict(features)
+
+        alarms = list()
+        valid_ids = np.asarray(track_ids)[valid]
+        for name, mask in self.__alarm_engine.evaluate(slots, timestamp, features, labels[valid]).items():
+            alarms.extend([(track_id, name) for track_id in valid_ids[mask].tolist()])
+
+        return labels, alarms
+
@@ -0,0 +1,145 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from SkyNet.Annotations.PoseKeypoints import KEYPOINT_DICT
+
+POSTURE_LABELS = ['em pé', 'sentado', 'deitado']
+
+UNKNOWN_POSTURE = -1
+
+FEATURE_NAMES = ['left_elbow_angle',
+                 'right_elbow_angle',
+                 'left_knee_angle',
+                 'right_knee_angle',
+                 'left_hip_angle',
+                 'right_hip_angle',
+                 'torso_angle',
+                 'aspect_ratio',
+                 'velocity_y',
+                 'velocity_x',
+                 'mean_speed',
+                 'mean_score']
+
+# (ponto, vértice, ponto) de cada ângulo articular, na ordem de FEATURE_NAMES
+JOINT_TRIPLETS = np.array([
+    [KEYPOINT_DICT['left_shoulder'], KEYPOINT_DICT['left_elbow'], KEYPOINT_DICT['left_wrist']],
+    [KEYPOINT_DICT['right_shoulder'], KEYPOINT_DICT['right_elbow'], KEYPOINT_DICT['right_wrist']],
+    [KEYPOINT_DICT['left_hip'], KEYPOINT_DICT['left_knee'], KEYPOINT_DICT['left_ankle']],
+    [KEYPOINT_DICT['right_hip'], KEYPOINT_DICT['right_knee'], KEYPOINT_DICT['right_ankle']],
+    [KEYPOINT_DICT['left_shoulder'], KEYPOINT_DICT['left_hip'], KEYPOINT_DICT['left_knee']],
+    [KEYPOINT_DICT['right_shoulder'], KEYPOINT_DICT['right_hip'], KEYPOINT_DICT['right_knee']]
+])
+
+SHOULDERS = [KEYPOINT_DICT['left_shoulder'], KEYPOINT_DICT['right_shoulder']]
+
+HIPS = [KEYPOINT_DICT['left_hip'], KEYPOINT_DICT['right_hip']]
+
+
+def posture_features(keypoints, boxes, previous_keypoints, elapsed):
+    """
+    Características de postura e movimento de todos os rastreios em um único passo
+    :param keypoints: pontos chave normalizados do quadro atual [T, 17, 3] (y, x, score)
+    :param boxes: caixas normalizadas do quadro atual [T, 4] (left, top, right, bottom)
+    :param previous_keypoints: pontos chave de um quadro anterior [T, 17, 3]
+    :param elapsed: tempo entre os dois quadros (s) [T]
+    :return: matriz [T, len(FEATURE_NAMES)]
+    """
+    points = keypoints[:, :, :2]
+
+    # ângulos articulares (graus) no vértice de cada trio
+    first = points[:, JOINT_TRIPLETS[:, 0]] - points[:, JOINT_TRIPLETS[:, 1]]
+    second = points[:, JOINT_TRIPLETS[:, 2]] - points[:, JOINT_TRIPLETS[:, 1]]
+    cosine = np.sum(first * second, axis=2) / (np.linalg.norm(first, axis=2) *
+                                               np.linalg.norm(second, axis=2) + 1e-6)
+    angles = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+    # orientação do tronco: 0 graus em pé, 90 graus na horizontal
+    torso = points[:, SHOULDERS].mean(axis=1) - points[:, HIPS].mean(axis=1)
+    torso_angle = np.degrees(np.arctan2(np.abs(torso[:, 1]), -torso[:, 0]))
+
+    aspect_ratio = (boxes[:, 2] - boxes[:, 0]) / np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+
+    # velocidades em alturas de quadro por segundo - velocity_y positiva é para baixo
+    elapsed = np.maximum(elapsed, 1e-6)
+    displacement = points - previous_keypoints[:, :, :2]
+    center_velocity = displacement[:, HIPS].mean(axis=1) / elapsed[:, None]
+    mean_speed = np.linalg.norm(displacement, axis=2).mean(axis=1) / elapsed
+
+    mean_score = keypoints[:, :, 2].mean(axis=1)
+
+    return np.column_stack((angles,
+                            torso_angle,
+                            aspect_ratio,
+                            center_velocity[:, 0],
+                            center_velocity[:, 1],
+                            mean_speed,
+                            mean_score)).astype(np.float32)
+
+
+class RulePostureClassifier:
+    """
+    Classificador de postura por regras sobre as características - segue a interface
+    predict(X) do scikit-learn, de forma que pode ser trocado por um modelo treinado
+    """
+
+    def __init__(self,
+                 lying_torso_angle=60.0,
+                 lying_aspect_ratio=1.2,
+                 sitting_hip_angle=130.0,
+                 sitting_torso_angle=45.0,
+                 min_score=0.2):
+        """
+        Inicialização da classe
+        :param lying_torso_angle: inclinação do tronco (graus) a partir da qual a pessoa está deitada
+        :param lying_aspect_ratio: razão largura/altura da caixa a partir da qual a pessoa está deitada
+        :param sitting_hip_angle: ângulo médio do quadril (graus) abaixo do qual a pessoa está sentada
+        :param sitting_torso_angle: inclinação máxima do tronco (graus) de uma pessoa sentada
+        :param min_score: score médio mínimo dos pontos chave - abaixo disso a postura é indefinida
+        """
+        self.__lying_torso_angle = lying_torso_angle
+        self.__lying_aspect_ratio = lying_aspect_ratio
+        self.__sitting_hip_angle = sitting_hip_angle
+        self.__sitting_torso_angle = sitting_torso_angle
+        self.__min_score = min_score
+        self.__columns = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+    def predict(self, features):
+        """
+        Classifica a postura de todos os rastreios
+        :param features: matriz [T, len(FEATURE_NAMES)]
+        :return: índice em POSTURE_LABELS de cada rastreio, ou UNKNOWN_POSTURE
+        """
+        column = self.__columns
+        torso_angle = features[:, column['torso_angle']]
+        hip_angle = features[:, [column['left_hip_angle'], column['right_hip_angle']]].mean(axis=1)
+
+        lying = (torso_angle > self.__lying_torso_angle) | \
+                (features[:, column['aspect_ratio']] > self.__lying_aspect_ratio)
+        sitting = (hip_angle < self.__sitting_hip_angle) & (torso_angle < self.__sitting_torso_angle)
+
+        labels = np.zeros(len(features), dtype=np.int64)
+        labels[sitting] = POSTURE_LABELS.index('sentado')
+        labels[lying] = POSTURE_LABELS.index('deitado')
+        labels[features[:, column['mean_score']] < self.__min_score] = UNKNOWN_POSTURE
+        return labels
@@ -0,0 +1,233 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import cProfile
+import gc
+import heapq
+import json
+import os
+import random
+import threading
+import time
+
+
+class NullSpan:
+    """
+    Intervalo vazio - usado quando o rastreamento está desligado
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """
+    Intervalo de tempo de um estágio, com atributos
+    """
+
+    __slots__ = ('tracer', 'name', 'attributes', 'start')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add_event(self.name, self.start, time.perf_counter_ns(), self.attributes)
+        return False
+
+    def set(self, **attributes):
+        """
+        Acrescenta atributos conhecidos só durante o intervalo (ex.: número de pessoas)
+        """
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """
+    Rastreamento de desempenho por quadro: intervalos de cada estágio e de cada
+    invocação dos modelos, gravados no formato Chrome trace-event (chrome://tracing,
+    Perfetto, speedscope). Opcionalmente roda o cProfile em todos os quadros (ou, se
+    pedido, em uma amostra de 1 em cada `profile_every`) e guarda apenas os perfis dos
+    N mais lentos
+    """
+
+    def __init__(self,
+                 trace_file=None,
+                 profile_slowest=0,
+                 profile_every=1,
+                 profile_directory='profiles',
+                 max_events=1000000):
+        """
+        Inicialização da classe
+        :param trace_file: arquivo JSON de saída - None desliga o rastreamento
+        :param profile_slowest: número de quadros mais lentos com perfil do cProfile (0 desliga)
+        :param profile_every: o cProfile roda, em média, em 1 de cada `profile_every` quadros -
+                              o padrão 1 perfila todos, para não perder o quadro mais lento
+        :param profile_directory: diretório dos perfis (.prof) dos quadros mais lentos
+        :param max_events: limite de eventos em memória - os excedentes são descartados
+        """
+        self.__trace_file = trace_file
+        self.__enabled = trace_file is not None
+        self.__profile_slowest = profile_slowest if self.__enabled else 0
+        self.__profile_probability = 1.0 / max(1, profile_every)
+        self.__profile_directory = profile_directory
+        self.__max_events = max_events
+        self.__events = list()
+        self.__dropped = 0
+        self.__origin = time.perf_counter_ns()
+        self.__pid = os.getpid()
+
+        self.__frame_number = 0
+        self.__frame_start = 0
+        self.__profile = None
+        self.__slowest = list()
+        self.__gc_start = 0
+
+        if self.__enabled:
+            gc.callbacks.append(self.__gc_callback)
+
+    def __gc_callback(self, phase, info):
+        if phase == 'start':
+            self.__gc_start = time.perf_counter_ns()
+        else:
+            self.add_event('gc', self.__gc_start, time.perf_counter_ns(),
+                           {'generation': info['generation'], 'collected': info['collected']})
+
+    def is_enabled(self):
+        return self.__enabled
+
+    def add_event(self, name, start, end, attributes=None):
+        """
+        Registra um intervalo já medido
+        :param name: nome do intervalo
+        :param start: início (time.perf_counter_ns)
+        :param end: fim (time.perf_counter_ns)
+        :param attributes: atributos do intervalo
+        :return: None
+        """
+        if not self.__enabled:
+            return
+        if len(self.__events) >= self.__max_events:
+            self.__dropped += 1
+            return
+        self.__events.append({'name': name,
+                              'ph': 'X',
+                              'ts': (start - self.__origin) / 1000.0,
+                              'dur': (end - start) / 1000.0,
+                              'pid': self.__pid,
+                              'tid': threading.get_ident(),
+                              'args': attributes if attributes is not None else {}})
+
+    def span(self, name, **attributes):
+        """
+        Intervalo de um estágio, para uso com `with`
+        :param name: nome do intervalo
+        :param attributes: atributos do intervalo
+        :return: Span (ou NULL_SPAN com o rastreamento desligado)
+        """
+        if not self.__enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def begin_frame(self):
+        """
+        Início do processamento de um quadro
+        :return: None
+        """
+        if not self.__enabled:
+            return
+        self.__frame_number += 1
+        # amostragem (opcional) aleatória, para não coincidir com trabalho periódico do laço
+        if self.__profile_slowest > 0 and random.random() < self.__profile_probability:
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+        self.__frame_start = time.perf_counter_ns()
+
+    def end_frame(self, **attributes):
+        """
+        Fim do processamento de um quadro
+        :param attributes: atributos do quadro (ex.: número de pessoas)
+        :return: None
+        """
+        if not self.__enabled:
+            return
+        end = time.perf_counter_ns()
+        attributes['frame'] = self.__frame_number
+        self.add_event('frame', self.__frame_start, end, attributes)
+
+        if self.__profile is not None:
+            self.__profile.disable()
+            # heap mínimo: mantém apenas os perfis dos quadros mais lentos
+            entry = (end - self.__frame_start, self.__frame_number, self.__profile)
+            if len(self.__slowest) < self.__profile_slowest:
+                heapq.heappush(self.__slowest, entry)
+            else:
+                heapq.heappushpop(self.__slowest, entry)
+            self.__profile = None
+
+    def close(self):
+        """
+        Grava o arquivo de rastreamento e os perfis dos quadros mais lentos
+        :return: None
+        """
+        if not self.__enabled:
+            return
+        self.__enabled = False
+        gc.callbacks.remove(self.__gc_callback)
+
+        # quadro interrompido antes de end_frame
+        if self.__profile is not None:
+            self.__profile.disable()
+            self.__profile = None
+
+        with open(self.__trace_file, 'w') as f:
+            json.dump({'traceEvents': self.__events,
+                       'displayTimeUnit': 'ms',
+                       'otherData': {'dropped_events': self.__dropped}}, f)
+
+        if len(self.__slowest) > 0:
+            os.makedirs(self.__profile_directory, exist_ok=True)
+            for duration, frame_number, profile in self.__slowest:
+                profile.dump_stats(os.path.join(self.__profile_directory,
+                                                'frame_{:08d}_{:.1f}ms.prof'.format(frame_number,
+                                                                                   duration / 1e6)))
+            self.__slowest = list()
+
+
+# rastreador desligado, padrão dos componentes quando nenhum é informado
+NULL_TRACER = Tracer()
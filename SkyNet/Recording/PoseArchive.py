@@ -0,0 +1,395 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+METADATA_FILE = 'archive.json'
+
+MANIFEST_FILE = 'manifest.bin'
+
+DATA_SUFFIX = '.poses'
+
+INDEX_SUFFIX = '.index.npy'
+
+# índice por rastreio de cada bloco: os registros de um rastreio são contíguos e ordenados no tempo
+INDEX_DTYPE = np.dtype([('track_id', '<i8'),
+                        ('start', '<i8'),
+                        ('count', '<i8'),
+                        ('t_min', '<f8'),
+                        ('t_max', '<f8')])
+
+# manifesto do arquivo, uma linha por bloco completo: as consultas por tempo ou rastreio
+# só abrem os blocos que podem conter registros
+MANIFEST_DTYPE = np.dtype([('chunk', '<i8'),
+                           ('count', '<i8'),
+                           ('t_min', '<f8'),
+                           ('t_max', '<f8'),
+                           ('track_min', '<i8'),
+                           ('track_max', '<i8')])
+
+
+def pose_record_dtype(keypoint_dtype='float16'):
+    """
+    Registro de largura fixa de uma pessoa em um quadro
+    :param keypoint_dtype: 'float16' ou 'float32'
+    :return: np.dtype do registro (timestamp, track_id, caixa e 17 x (y, x, score))
+    """
+    keypoint_dtype = np.dtype(keypoint_dtype)
+    if keypoint_dtype not in (np.dtype('float16'), np.dtype('float32')):
+        raise ValueError("Tipo dos pontos chave deve ser float16 ou float32: {}".format(keypoint_dtype))
+    return np.dtype([('timestamp', '<f8'),
+                     ('track_id', '<i4'),
+                     ('box', '<f4', (4,)),
+                     ('keypoints', keypoint_dtype.newbyteorder('<'), (17, 3))])
+
+
+def chunk_path(directory, number, suffix):
+    return os.path.join(directory, 'chunk_{:06d}{}'.format(number, suffix))
+
+
+def load_manifest(directory):
+    """
+    Lê o manifesto - uma linha incompleta no final (gravação interrompida) é ignorada
+    :param directory: diretório do arquivo de posturas
+    :return: array de MANIFEST_DTYPE
+    """
+    manifest_file = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return np.empty(0, dtype=MANIFEST_DTYPE)
+    with open(manifest_file, 'rb') as f:
+        data = f.read()
+    return np.frombuffer(data, dtype=MANIFEST_DTYPE, count=len(data) // MANIFEST_DTYPE.itemsize)
+
+
+def save_atomic(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+class PoseArchiveWriter:
+    """
+    Gravação do arquivo de posturas em blocos: os registros de cada quadro são
+    enfileirados e gravados por uma thread em segundo plano. Um bloco é fechado ao
+    atingir `chunk_records` registros ou a cada `flush_interval` segundos. Ao fechar um bloco,
+    os registros são ordenados por (track_id, timestamp), o índice por rastreio é gravado
+    e o bloco é acrescentado ao manifesto - só então fica visível para os leitores.
+    O rastreador reinicia os ids a cada execução: ao reabrir um diretório existente, os
+    ids gravados são deslocados para depois do maior id já gravado (`get_track_offset`),
+    para que rastreios de execuções diferentes não se misturem
+    """
+
+    def __init__(self,
+                 directory,
+                 keypoint_dtype='float16',
+                 chunk_records=65536,
+                 flush_interval=60.0,
+                 queue_size=256):
+        """
+        Inicialização da classe
+        :param directory: diretório do arquivo de posturas
+        :param keypoint_dtype: 'float16' ou 'float32'
+        :param chunk_records: número máximo de registros por bloco
+        :param flush_interval: intervalo máximo (s) até os registros pendentes chegarem ao disco - None desliga
+        :param queue_size: quadros pendentes antes do append bloquear
+        """
+        self.__directory = directory
+        self.__dtype = pose_record_dtype(keypoint_dtype)
+        self.__chunk_records = chunk_records
+        self.__flush_interval = flush_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        metadata_file = os.path.join(directory, METADATA_FILE)
+        metadata = {'keypoint_dtype': np.dtype(keypoint_dtype).name}
+        if os.path.exists(metadata_file):
+            with open(metadata_file) as f:
+                existing = json.load(f)
+            if existing != metadata:
+                raise ValueError("Arquivo de posturas existente com formato diferente: {}".format(existing))
+        else:
+            with open(metadata_file, 'w') as f:
+                json.dump(metadata, f)
+
+        # blocos gravados sem entrar no manifesto (execução interrompida) são sobrescritos
+        manifest = load_manifest(directory)
+        self.__manifest_file = os.path.join(directory, MANIFEST_FILE)
+        with open(self.__manifest_file, 'ab') as f:
+            f.truncate(manifest.nbytes)
+        self.__chunk_number = len(manifest)
+        self.__track_offset = int(manifest['track_max'].max()) + 1 if len(manifest) > 0 else 0
+
+        self.__pending = list()
+        self.__pending_count = 0
+        self.__closing = False
+        self.__error = None
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __run(self):
+        try:
+            self.__write_loop()
+        except Exception as error:
+            # a falha é relatada por append e close; a fila continua sendo esvaziada
+            # até o close, para que append nunca bloqueie com a thread parada
+            self.__error = error
+            while not self.__closing:
+                self.__closing = self.__queue.get() is None
+
+    def __write_loop(self):
+        deadline = None if self.__flush_interval is None else time.monotonic() + self.__flush_interval
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                records = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                records = ()
+            if records is None:
+                self.__closing = True
+                break
+            if len(records) > 0:
+                self.__pending.append(records)
+                self.__pending_count += len(records)
+            expired = deadline is not None and time.monotonic() >= deadline
+            if self.__pending_count >= self.__chunk_records or expired:
+                self.__write_chunk()
+            if expired:
+                deadline = time.monotonic() + self.__flush_interval
+        self.__write_chunk()
+
+    def __write_chunk(self):
+        """
+        Grava o bloco pendente ordenado por rastreio e o seu índice
+        """
+        if self.__pending_count == 0:
+            return
+
+        records = np.concatenate(self.__pending)
+        self.__pending = list()
+        self.__pending_count = 0
+
+        records = records[np.lexsort((records['timestamp'], records['track_id']))]
+
+        track_ids, starts, counts = np.unique(records['track_id'], return_index=True, return_counts=True)
+
+        index = np.empty(len(track_ids), dtype=INDEX_DTYPE)
+        index['track_id'] = track_ids
+        index['start'] = starts
+        index['count'] = counts
+        index['t_min'] = records['timestamp'][starts]
+        index['t_max'] = records['timestamp'][starts + counts - 1]
+
+        data_file = chunk_path(self.__directory, self.__chunk_number, DATA_SUFFIX)
+        index_file = chunk_path(self.__directory, self.__chunk_number, INDEX_SUFFIX)
+
+        records.tofile(data_file)
+        save_atomic(index_file, index)
+
+        # a linha do manifesto é acrescentada por último: marca o bloco como completo
+        entry = np.empty(1, dtype=MANIFEST_DTYPE)
+        entry['chunk'] = self.__chunk_number
+        entry['count'] = len(records)
+        entry['t_min'] = index['t_min'].min()
+        entry['t_max'] = index['t_max'].max()
+        entry['track_min'] = track_ids[0]
+        entry['track_max'] = track_ids[-1]
+        with open(self.__manifest_file, 'ab') as f:
+            f.write(entry.tobytes())
+
+        self.__chunk_number += 1
+
+    def append(self, timestamp, track_ids, boxes, keypoints):
+        """
+        Enfileira os resultados de um quadro
+        :param timestamp: instante do quadro (segundos)
+        :param track_ids: ids dos rastreios [N]
+        :param boxes: caixas delimitadoras [N, 4] (left, top, right, bottom)
+        :param keypoints: pontos chave [N, 17, 3] (y, x, score)
+        :return: None
+        """
+        self.__check_error()
+        if len(track_ids) == 0:
+            return
+        records = np.empty(len(track_ids), dtype=self.__dtype)
+        records['timestamp'] = timestamp
+        records['track_id'] = np.asarray(track_ids) + self.__track_offset
+        records['box'] = boxes
+        records['keypoints'] = keypoints
+        self.__queue.put(records)
+
+    def get_track_offset(self):
+        """
+        Deslocamento somado aos ids dos rastreios desta execução
+        :return: id gravado = id do rastreador + deslocamento
+        """
+        return self.__track_offset
+
+    def close(self):
+        """
+        Grava os registros pendentes e encerra a thread de gravação
+        :return: None
+        """
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        self.__check_error()
+
+    def __check_error(self):
+        if self.__error is not None:
+            raise RuntimeError("Falha na gravação do arquivo de posturas em {}".format(
+                self.__directory)) from self.__error
+
+
+class PoseArchiveReader:
+    """
+    Leitura do arquivo de posturas: o manifesto seleciona os blocos que podem conter
+    registros da consulta; só esses são mapeados em memória (np.memmap) e as consultas
+    devolvem visões dos registros, sem cópia. No máximo `max_open_chunks` blocos ficam
+    mapeados ao mesmo tempo - cada mapeamento mantém um descritor de arquivo aberto
+    """
+
+    def __init__(self, directory, max_open_chunks=64):
+        """
+        Inicialização da classe
+        :param directory: diretório do arquivo de posturas
+        :param max_open_chunks: número máximo de blocos mapeados em memória
+        """
+        self.__directory = directory
+
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+
+        self.__dtype = pose_record_dtype(metadata['keypoint_dtype'])
+        self.__max_open_chunks = max_open_chunks
+        self.__indexes = dict()
+        self.__records = OrderedDict()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Recarrega o manifesto - passam a ser consultados os blocos completos gravados
+        desde a última leitura
+        :return: None
+        """
+        self.__manifest = load_manifest(self.__directory)
+
+    def __chunk_index(self, chunk):
+        if chunk not in self.__indexes:
+            self.__indexes[chunk] = np.load(chunk_path(self.__directory, chunk, INDEX_SUFFIX))
+        return self.__indexes[chunk]
+
+    def __chunk_records(self, chunk):
+        """
+        Registros do bloco, mapeados sob demanda - os mapeamentos menos usados são liberados
+        """
+        if chunk in self.__records:
+            self.__records.move_to_end(chunk)
+        else:
+            if len(self.__records) >= self.__max_open_chunks:
+                self.__records.popitem(last=False)
+            self.__records[chunk] = np.memmap(chunk_path(self.__directory, chunk, DATA_SUFFIX),
+                                              dtype=self.__dtype,
+                                              mode='r')
+        return self.__records[chunk]
+
+    def get_dtype(self):
+        return self.__dtype
+
+    def get_time_range(self):
+        """
+        Intervalo de tempo coberto pelo arquivo
+        :return: (t_min, t_max) ou None se o arquivo está vazio
+        """
+        if len(self.__manifest) == 0:
+            return None
+        return float(self.__manifest['t_min'].min()), float(self.__manifest['t_max'].max())
+
+    def get_track_ids(self):
+        if len(self.__manifest) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.__chunk_index(chunk)['track_id']
+                                         for chunk in self.__manifest['chunk']]))
+
+    def __views(self, track_id, t_start, t_end):
+        """
+        Gera as visões da consulta, bloco a bloco
+        """
+        t_start = -np.inf if t_start is None else t_start
+        t_end = np.inf if t_end is None else t_end
+
+        manifest = self.__manifest
+        candidates = (manifest['t_max'] >= t_start) & (manifest['t_min'] <= t_end)
+        if track_id is not None:
+            candidates &= (manifest['track_min'] <= track_id) & (manifest['track_max'] >= track_id)
+
+        for chunk in manifest['chunk'][candidates]:
+            index = self.__chunk_index(chunk)
+            selected = index[(index['t_max'] >= t_start) & (index['t_min'] <= t_end)]
+            if track_id is not None:
+                selected = selected[selected['track_id'] == track_id]
+            if len(selected) == 0:
+                continue
+            records = self.__chunk_records(chunk)
+            for entry in selected:
+                segment = records[entry['start']:entry['start'] + entry['count']]
+                timestamps = segment['timestamp']
+                lo = np.searchsorted(timestamps, t_start, side='left')
+                hi = np.searchsorted(timestamps, t_end, side='right')
+                if hi > lo:
+                    yield segment[lo:hi]
+
+    def query(self, track_id=None, t_start=None, t_end=None):
+        """
+        Consulta por rastreio e/ou intervalo de tempo
+        :param track_id: id do rastreio ou None para todos
+        :param t_start: instante inicial (inclusive) ou None
+        :param t_end: instante final (inclusive) ou None
+        :return: lista de visões (np.memmap) - cada uma contígua, de um único rastreio e
+                 ordenada no tempo; os blocos aparecem em ordem cronológica. Cada visão mantém
+                 o seu bloco mapeado: para intervalos longos, prefira read
+        """
+        return list(self.__views(track_id, t_start, t_end))
+
+    def read(self, track_id=None, t_start=None, t_end=None):
+        """
+        Mesma consulta de query, concatenada em um único array (com cópia) - os blocos
+        são copiados um a um, sem manter mais que `max_open_chunks` mapeados
+        :return: array de registros
+        """
+        copies = [np.array(view) for view in self.__views(track_id, t_start, t_end)]
+        if len(copies) == 0:
+            return np.empty(0, dtype=self.__dtype)
+        return np.concatenate(copies)
@@ -0,0 +1,223 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+BUS_MAGIC = 0x534B594E
+
+HEADER_DTYPE = np.dtype([('magic', '<u4'),
+                         ('slots', '<u4'),
+                         ('max_people', '<u4'),
+                         ('reserved', '<u4'),
+                         ('write_seq', '<u8')])
+
+# os registros começam alinhados a uma linha de cache
+RECORDS_OFFSET = 64
+
+
+def frame_record_dtype(max_people=16):
+    """
+    Registro de tamanho fixo com os resultados de um quadro
+    :param max_people: número máximo de pessoas por quadro
+    :return: np.dtype do registro
+    """
+    return np.dtype([('seq', '<u8'),
+                     ('timestamp', '<f8'),
+                     ('count', '<i4'),
+                     ('track_ids', '<i4', (max_people,)),
+                     ('postures', '<i4', (max_people,)),
+                     ('boxes', '<f4', (max_people, 4)),
+                     ('keypoints', '<f4', (max_people, 17, 3))])
+
+
+def record_people(record):
+    """
+    Pessoas válidas de um registro
+    :param record: registro de quadro
+    :return: track_ids [N], postures [N], boxes [N, 4], keypoints [N, 17, 3]
+    """
+    count = int(record['count'])
+    return (record['track_ids'][:count],
+            record['postures'][:count],
+            record['boxes'][:count],
+            record['keypoints'][:count])
+
+
+class ResultBusWriter:
+    """
+    Publicador do barramento de resultados: buffer circular de registros de quadro em
+    memória compartilhada, com um único escritor e qualquer número de leitores.
+    Cada slot guarda o número de sequência do quadro; o escritor zera o número antes
+    de escrever e o grava de volta ao terminar, de forma que o leitor detecta
+    registros sobrescritos durante a leitura sem precisar de travas
+    """
+
+    def __init__(self, name, slots=64, max_people=16):
+        """
+        Inicialização da classe
+        :param name: nome do segmento de memória compartilhada
+        :param slots: número de quadros no buffer circular
+        :param max_people: número máximo de pessoas por quadro
+        """
+        self.__dtype = frame_record_dtype(max_people)
+        self.__slots = slots
+        self.__max_people = max_people
+        self.__memory = shared_memory.SharedMemory(name=name,
+                                                   create=True,
+                                                   size=RECORDS_OFFSET + slots * self.__dtype.itemsize)
+        self.__header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.__memory.buf)
+        self.__records = np.ndarray((slots,), dtype=self.__dtype, buffer=self.__memory.buf, offset=RECORDS_OFFSET)
+        self.__records['seq'] = 0
+        self.__header['slots'] = slots
+        self.__header['max_people'] = max_people
+        self.__header['write_seq'] = 0
+        self.__header['magic'] = BUS_MAGIC
+        self.__seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def publish(self, timestamp, track_ids, boxes, keypoints, postures=None):
+        """
+        Publica os resultados de um quadro
+        :param timestamp: instante do quadro (s)
+        :param track_ids: ids dos rastreios [N]
+        :param boxes: caixas delimitadoras [N, 4]
+        :param keypoints: pontos chave [N, 17, 3] (y, x, score)
+        :param postures: postura de cada rastreio [N] ou None
+        :return: número de sequência do quadro publicado
+        """
+        count = min(len(track_ids), self.__max_people)
+        seq = self.__seq + 1
+        slot = (seq - 1) % self.__slots
+        record = self.__records[slot:slot + 1]
+
+        record['seq'] = 0
+        record['timestamp'] = timestamp
+        record['count'] = count
+        if count > 0:
+            record['track_ids'][0, :count] = np.asarray(track_ids)[:count]
+            record['boxes'][0, :count] = np.asarray(boxes).reshape(-1, 4)[:count]
+            record['keypoints'][0, :count] = np.asarray(keypoints).reshape(-1, 17, 3)[:count]
+            record['postures'][0, :count] = -1 if postures is None else np.asarray(postures)[:count]
+        record['seq'] = seq
+
+        self.__header['write_seq'] = seq
+        self.__seq = seq
+        return seq
+
+    def close(self):
+        """
+        Libera e remove o segmento de memória compartilhada
+        :return: None
+        """
+        del self.__header
+        del self.__records
+        self.__memory.close()
+        self.__memory.unlink()
+
+
+class ResultBusReader:
+    """
+    Assinante do barramento de resultados - cada leitor consome no seu próprio ritmo;
+    se ficar mais de `slots` quadros atrasado, os quadros perdidos são contabilizados
+    """
+
+    def __init__(self, name, from_start=False):
+        """
+        Inicialização da classe
+        :param name: nome do segmento de memória compartilhada
+        :param from_start: consome os quadros ainda disponíveis no buffer em vez de só os novos
+        """
+        try:
+            self.__memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: o leitor não pode registrar o segmento no resource_tracker,
+            # senão o segmento é removido quando o leitor termina
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                self.__memory = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+        self.__header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.__memory.buf)
+        if self.__header['magic'][0] != BUS_MAGIC:
+            raise ValueError("Segmento de memória compartilhada não é um barramento de resultados: {}".format(name))
+
+        self.__slots = int(self.__header['slots'][0])
+        self.__dtype = frame_record_dtype(int(self.__header['max_people'][0]))
+        self.__records = np.ndarray((self.__slots,), dtype=self.__dtype, buffer=self.__memory.buf,
+                                    offset=RECORDS_OFFSET)
+        write_seq = int(self.__header['write_seq'][0])
+        self.__next_seq = max(1, write_seq - self.__slots + 1) if from_start else write_seq + 1
+        self.__dropped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def poll(self, max_records=None):
+        """
+        Lê os quadros publicados desde a última leitura
+        :param max_records: número máximo de quadros lidos
+        :return: array de registros (cópia local apenas dos quadros consumidos)
+        """
+        write_seq = int(self.__header['write_seq'][0])
+        if write_seq < self.__next_seq:
+            return np.empty(0, dtype=self.__dtype)
+
+        # atraso maior que o buffer: os quadros mais antigos já foram sobrescritos
+        oldest = write_seq - self.__slots + 1
+        if self.__next_seq < oldest:
+            self.__dropped += oldest - self.__next_seq
+            self.__next_seq = oldest
+
+        last = write_seq if max_records is None else min(write_seq, self.__next_seq + max_records - 1)
+        seqs = np.arange(self.__next_seq, last + 1, dtype=np.uint64)
+        slots = (seqs - 1) % self.__slots
+
+        records = self.__records[slots]
+
+        # registros sobrescritos durante a cópia são descartados
+        valid = (records['seq'] == seqs) & (self.__records['seq'][slots] == seqs)
+        self.__dropped += int(np.count_nonzero(~valid))
+        self.__next_seq = last + 1
+        return records[valid]
+
+    def get_dropped(self):
+        return self.__dropped
+
+    def get_next_seq(self):
+        return self.__next_seq
+
+    def close(self):
+        del self.__header
+        del self.__records
+        self.__memory.close()
@@ -0,0 +1,402 @@
+"""
+SkyNet - Detecção, Rastreamento e Classificação de Pose utilizando TensorFlow
+
+Copyright 2023 Augusto Mathias Adams <augusto.adams@ufpr.br>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+import numpy as np
+from SkyNet.PoseEstimation.PoseEstimation import PoseEstimation
+from SkyNet.ObjectDetection.ObjectDetector import ObjectDetector
+from SkyNet.Utils import crop_bb, non_max_suppression
+
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+
+def decode_image(data):
+    """
+    Decodifica uma imagem JPEG/PNG para RGB
+    :param data: bytes da imagem
+    :return: imagem RGB ou None se inválida
+    """
+    if len(data) == 0:
+        return None
+    try:
+        image = cv.imdecode(np.frombuffer(data, dtype=np.uint8), cv.IMREAD_COLOR)
+    except cv.error:
+        return None
+    if image is None:
+        return None
+    return cv.cvtColor(image, cv.COLOR_BGR2RGB)
+
+
+class InferenceRequest:
+    """
+    Requisição pendente: imagem decodificada, tipo ('detect' ou 'pose') e instantes
+    usados na contabilidade de latência
+    """
+
+    def __init__(self, kind, frame, received, decoded, future):
+        self.kind = kind
+        self.frame = frame
+        self.received = received
+        self.decoded = decoded
+        self.future = future
+
+
+class InferenceServer:
+    """
+    Servidor local de inferência (HTTP sobre TCP ou socket Unix) - as imagens de
+    vários clientes são agrupadas em micro-lotes dentro de uma pequena janela de
+    tempo e processadas por uma única instância dos modelos
+
+    Rotas:
+        POST /detect - imagem codificada (JPEG/PNG): caixas, scores e pontos chave das pessoas
+        POST /pose   - recorte codificado de uma pessoa: pontos chave
+        GET  /stats  - estatísticas de lotes e latência
+    """
+
+    def __init__(self,
+                 pose_input_size=256,
+                 detector_input_size=300,
+                 pose_interpreter_file='models/singlepose_movenet.tflite',
+                 detector_interpreter_file='models/ssd_mobilenet_v2.tflite',
+                 max_batch_size=8,
+                 batch_window=0.005,
+                 max_queue_size=64,
+                 max_body_size=8 * 1024 * 1024):
+        """
+        Inicialização da classe
+        :param pose_input_size: o tamanho do quadro tratado pelo estimador de pose
+        :param detector_input_size: o tamanho do quadro tratado pelo detector
+        :param pose_interpreter_file: o arquivo do estimador de pose
+        :param detector_interpreter_file: o arquivo do detector
+        :param max_batch_size: número máximo de requisições por lote
+        :param batch_window: tempo máximo (s) de espera para completar um lote
+        :param max_queue_size: requisições pendentes antes de recusar novas (HTTP 503)
+        :param max_body_size: tamanho máximo do corpo da requisição, em bytes
+        """
+        self.__pose_estimator = PoseEstimation(pose_input_size, pose_interpreter_file)
+        self.__object_detector = ObjectDetector(detector_input_size, detector_interpreter_file)
+        self.__max_batch_size = max_batch_size
+        self.__batch_window = batch_window
+        self.__max_queue_size = max_queue_size
+        self.__max_body_size = max_body_size
+
+        # os interpretadores TFLite não são thread-safe: uma única thread de inferência
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+
+        self.__queue = None
+        self.__server = None
+        self.__batcher_task = None
+
+        self.__requests = 0
+        self.__rejected = 0
+        self.__batches = 0
+        self.__batched_requests = 0
+        self.__latencies = deque(maxlen=1000)
+
+    def __run_batch(self, kinds, frames):
+        """
+        Processa um micro-lote - roda na thread de inferência
+        :param kinds: tipo de cada requisição
+        :param frames: imagem RGB de cada requisição
+        :return: lista de resultados, na ordem das requisições
+        """
+        results = [dict() for _ in frames]
+
+        crops = list()
+        offsets = list()
+        owners = list()
+
+        detect_indexes = [i for i, kind in enumerate(kinds) if kind == 'detect']
+
+        if len(detect_indexes) > 0:
+            detections = self.__object_detector.run_batch_detector([frames[i] for i in detect_indexes])
+            for i, (classes, names, centroids, boxes, scores) in zip(detect_indexes, detections):
+                maintainboxes = non_max_suppression(np.array(boxes), 0.1, np.array(scores))
+                boxes = [boxes[k] for k in maintainboxes]
+                results[i]['boxes'] = boxes
+                results[i]['scores'] = [float(scores[k]) for k in maintainboxes]
+                results[i]['keypoints'] = [None] * len(boxes)
+                image_crops = crop_bb(frames[i], OrderedDict(enumerate(boxes)))
+                for k, crop in image_crops.items():
+                    if crop.size == 0:
+                        continue
+                    crops.append(crop)
+                    offsets.append((boxes[k][0], boxes[k][1]))
+                    owners.append((i, k))
+
+        for i, kind in enumerate(kinds):
+            if kind == 'pose':
+                results[i]['keypoints'] = [None]
+                crops.append(frames[i])
+                offsets.append((0, 0))
+                owners.append((i, 0))
+
+        # todos os recortes do lote - de todas as requisições - em uma única estimação
+
+        if len(crops) > 0:
+            poses = self.__pose_estimator.run_batch_estimator(crops, offsets)
+            for (i, k), pose in zip(owners, poses):
+                results[i]['keypoints'][k] = pose.get_points().tolist()
+
+        return results
+
+    async def __batcher(self):
+        """
+        Agrupa as requisições pendentes em micro-lotes e os envia à thread de inferência
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.__queue.get()]
+            deadline = loop.time() + self.__batch_window
+            while len(batch) < self.__max_batch_size:
+                if not self.__queue.empty():
+                    batch.append(self.__queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.__queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.__executor,
+                                                     self.__run_batch,
+                                                     [request.kind for request in batch],
+                                                     [request.frame for request in batch])
+            except Exception as error:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                continue
+            finished = time.perf_counter()
+
+            self.__batches += 1
+            self.__batched_requests += len(batch)
+
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result((result, started, finished, len(batch)))
+
+    async def __infer(self, kind, body):
+        """
+        Decodifica a imagem, enfileira e aguarda o resultado do micro-lote
+        :param kind: 'detect' ou 'pose'
+        :param body: imagem codificada
+        :return: status HTTP e resposta
+        """
+        received = time.perf_counter()
+
+        # recusa cedo, antes de gastar tempo decodificando
+        if self.__queue.full():
+            self.__rejected += 1
+            return 503, {'error': 'fila cheia'}
+
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(None, decode_image, body)
+        if frame is None:
+            return 400, {'error': 'imagem inválida'}
+        decoded = time.perf_counter()
+
+        request = InferenceRequest(kind, frame, received, decoded, loop.create_future())
+        try:
+            self.__queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.__rejected += 1
+            return 503, {'error': 'fila cheia'}
+
+        self.__requests += 1
+
+        try:
+            result, started, finished, batch_size = await request.future
+        except Exception as error:
+            return 500, {'error': str(error)}
+
+        done = time.perf_counter()
+        self.__latencies.append(done - received)
+
+        result['batch_size'] = batch_size
+        result['latency_ms'] = {'decode': 1000.0 * (decoded - received),
+                                'queue': 1000.0 * (started - decoded),
+                                'inference': 1000.0 * (finished - started),
+                                'total': 1000.0 * (done - received)}
+        return 200, result
+
+    def get_stats(self):
+        """
+        Estatísticas do servidor
+        :return: dicionário com contadores, tamanho médio dos lotes e percentis de latência (ms)
+        """
+        stats = {'requests': self.__requests,
+                 'rejected': self.__rejected,
+                 'batches': self.__batches,
+                 'mean_batch_size': self.__batched_requests / self.__batches if self.__batches > 0 else 0.0,
+                 'queue_size': self.__queue.qsize() if self.__queue is not None else 0}
+        if len(self.__latencies) > 0:
+            p50, p95, p99 = np.percentile(np.array(self.__latencies) * 1000.0, [50, 95, 99])
+            stats['latency_ms'] = {'p50': p50, 'p95': p95, 'p99': p99}
+        return stats
+
+    async def __dispatch(self, method, path, body):
+        if path == '/stats':
+            if method != 'GET':
+                return 405, {'error': 'método não permitido'}
+            return 200, self.get_stats()
+        if path in ('/detect', '/pose'):
+            if method != 'POST':
+                return 405, {'error': 'método não permitido'}
+            return await self.__infer(path[1:], body)
+        return 404, {'error': 'rota desconhecida'}
+
+    async def __respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = 'HTTP/1.1 {} {}\r\n' \
+               'Content-Type: application/json\r\n' \
+               'Content-Length: {}\r\n' \
+               'Connection: {}\r\n'.format(status, HTTP_STATUS[status], len(body),
+                                           'keep-alive' if keep_alive else 'close')
+        if status == 503:
+            head += 'Retry-After: 1\r\n'
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+    async def __handle(self, reader, writer):
+        """
+        Conexão HTTP/1.1 com keep-alive
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                request = request_line.decode('latin-1').split()
+                if len(request) != 3:
+                    await self.__respond(writer, 400, {'error': 'requisição inválida'}, False)
+                    break
+                method, path, version = request
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                # o corpo precisa de Content-Length - sem ele não há como delimitar a próxima requisição
+                if 'transfer-encoding' in headers:
+                    await self.__respond(writer, 411, {'error': 'Content-Length obrigatório'}, False)
+                    break
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.__respond(writer, 400, {'error': 'Content-Length inválido'}, False)
+                    break
+                if length > self.__max_body_size:
+                    await self.__respond(writer, 413, {'error': 'imagem muito grande'}, False)
+                    break
+                body = await reader.readexactly(length) if length > 0 else b''
+
+                status, payload = await self.__dispatch(method, path.split('?')[0], body)
+                await self.__respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as error:
+            # último recurso: responde antes de fechar a conexão
+            try:
+                await self.__respond(writer, 500, {'error': str(error)}, False)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080, unix_socket=None):
+        """
+        Inicia o servidor no laço de eventos corrente
+        :param host: endereço TCP
+        :param port: porta TCP
+        :param unix_socket: caminho do socket Unix - se informado, substitui host e porta
+        :return: o asyncio.Server
+        """
+        self.__queue = asyncio.Queue(maxsize=self.__max_queue_size)
+        self.__batcher_task = asyncio.create_task(self.__batcher())
+        if unix_socket is not None:
+            self.__server = await asyncio.start_unix_server(self.__handle, path=unix_socket)
+        else:
+            self.__server = await asyncio.start_server(self.__handle, host, port)
+        return self.__server
+
+    async def stop(self):
+        """
+        Encerra o servidor e a tarefa de agrupamento
+        :return: None
+        """
+        self.__server.close()
+        await self.__server.wait_closed()
+        self.__batcher_task.cancel()
+        try:
+            await self.__batcher_task
+        except asyncio.CancelledError:
+            pass
+
+    def run(self, host='127.0.0.1', port=8080, unix_socket=None):
+        """
+        Roda o servidor até ser interrompido
+        """
+        async def serve():
+            server = await self.start(host, port, unix_socket)
+            try:
+                await server.serve_forever()
+            finally:
+                await self.stop()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__executor.shutdown()
+
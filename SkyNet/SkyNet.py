@@ -26,8 +26,14 @@ from SkyNet.Annotations.PoseKeypoints import draw_keypoints, draw_connections
 from SkyNet.Annotations.BoundingBoxes import draw_rectangle
 from SkyNet.ObjectDetection.ObjectDetector import ObjectDetector
 from SkyNet.ObjectTracking.CentroidTracker import CentroidTracker
+from SkyNet.MotionDetection.MotionGate import MotionGate
 from SkyNet.Utils import crop_bb, non_max_suppression
+from SkyNet.Recording.PoseArchive import PoseArchiveWriter
+from SkyNet.PostureClassification.PostureClassification import PostureClassification, posture_name
+from SkyNet.ResultBus.ResultBus import ResultBusWriter
+from SkyNet.Profiling.Tracer import Tracer
 from collections import OrderedDict
+import time
 import cv2 as cv
 import numpy as np
 
@@ -39,7 +45,32 @@ class SkyNet:
                  pose_input_size=256,
                  detector_input_size=300,
                  pose_interpreter_file='models/singlepose_movenet.tflite',
-                 detector_interpreter_file='models/ssd_mobilenet_v2.tflite'):
+                 detector_interpreter_file='models/ssd_mobilenet_v2.tflite',
+                 motion_gating=False,
+                 max_skip_frames=30,
+                 pose_mode='singlepose',
+                 tiled_detection=False,
+                 tile_size=400,
+                 tile_overlap=0.2,
+                 detection_regions=None,
+                 archive_directory=None,
+                 posture_classifier=None,
+                 result_bus_name=None,
+                 trace_file=None,
+                 profile_slowest=0,
+                 profile_every=1):
+
+        if pose_mode not in ('singlepose', 'multipose'):
+            raise ValueError("Modo de estimação de postura desconhecido: {}".format(pose_mode))
+
+        if not 0.0 <= tile_overlap < 1.0:
+            raise ValueError("A sobreposição dos ladrilhos deve estar em [0, 1): {}".format(tile_overlap))
+
+        self.__pose_mode = pose_mode
+
+        # rastreamento de desempenho por quadro (Chrome trace-event) - desligado sem trace_file
+
+        self.__tracer = Tracer(trace_file, profile_slowest, profile_every)
 
         self.__capture_device = cv.VideoCapture(capture_device)
 
@@ -49,100 +80,406 @@ class SkyNet:
 
         r, frame = self.__capture_device.read()
 
-        self.__pose_estimator = PoseEstimation(pose_input_size, pose_interpreter_file)
+        self.__pose_estimator = PoseEstimation(pose_input_size, pose_interpreter_file, self.__tracer)
+
+        # a Movenet Multipose detecta as pessoas por conta própria - o SSD não é necessário
 
-        self.__object_detector = ObjectDetector(detector_input_size,
-                                                detector_interpreter_file)
+        if pose_mode == 'singlepose':
+            self.__object_detector = ObjectDetector(detector_input_size,
+                                                    detector_interpreter_file,
+                                                    self.__tracer)
+        else:
+            self.__object_detector = None
 
         self.__tracker = CentroidTracker(10)
 
+        self.__posture_classifier = PostureClassification(classifier=posture_classifier)
+
+        # barramento de resultados em memória compartilhada para outros processos locais
+
+        if result_bus_name is not None:
+            self.__result_bus = ResultBusWriter(result_bus_name)
+        else:
+            self.__result_bus = None
+
+        self.__motion_gate = MotionGate(max_skip_frames=max_skip_frames) if motion_gating else None
+
+        # detecção em mosaico - opcionalmente restrita às regiões de interesse (left, top, right, bottom)
+
+        self.__tiled_detection = tiled_detection
+
+        self.__tile_size = tile_size
+
+        self.__tile_overlap = tile_overlap
+
+        self.__detection_regions = detection_regions
+
+        # gravação dos resultados por quadro em arquivo indexado
+
+        if archive_directory is not None:
+            self.__archive = PoseArchiveWriter(archive_directory)
+        else:
+            self.__archive = None
+
+        self.__poses = list()
+
+        self.__pose_position = OrderedDict()
+
     def __box_cleanup(self, boxes, nms):
         new_boxes = list()
         for i in nms:
             new_boxes.append(boxes[i])
         return new_boxes
 
-    def run(self):
-
-        while self.__capture_device.isOpened():
-            # Lendo o frame atual
-            ret, frame = self.__capture_device.read()
-            if not ret:
-                break
-            width = int(self.__capture_device.get(cv.CAP_PROP_FRAME_WIDTH))  # float `width`
-            height = int(self.__capture_device.get(cv.CAP_PROP_FRAME_HEIGHT))  # float `height`
-            # Convertendo o frame para RGB
-
-            frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-
+    def __static_tracks(self, region):
+        """
+        Caixas dos rastreios ativos que estão totalmente fora da região de movimento
+        :param region: região de movimento (left, top, right, bottom)
+        :return: lista de (objectID, caixa delimitadora)
+        """
+        left, top, right, bottom = region
+        static_tracks = list()
+        for objectID, bbox in self.__tracker.bboxes.items():
+            if self.__tracker.disappeared[objectID] > 0:
+                continue
+            l, t, r, b = bbox
+            if r <= left or l >= right or b <= top or t >= bottom:
+                static_tracks.append((objectID, bbox))
+        return static_tracks
+
+    def __track_region(self, region, width, height, margin=0.1):
+        """
+        Aumenta a região de movimento até conter inteiramente os rastreios que ela corta:
+        sem isso, o detector veria só parte da pessoa (ex.: uma mão acenando), a caixa
+        seria descartada de __static_tracks e o rastreio se perderia
+        :param region: região de movimento (left, top, right, bottom)
+        :param width: largura do quadro
+        :param height: altura do quadro
+        :param margin: margem adicionada às caixas dos rastreios, relativa ao seu tamanho
+        :return: região aumentada (left, top, right, bottom), dentro do quadro
+        """
+        left, top, right, bottom = region
+        grown = True
+        while grown:
+            # a região aumentada pode passar a cortar outros rastreios
+            grown = False
+            for (l, t, r, b) in self.__tracker.bboxes.values():
+                if r <= left or l >= right or b <= top or t >= bottom:
+                    continue
+                margin_x, margin_y = margin * (r - l), margin * (b - t)
+                l, t, r, b = l - margin_x, t - margin_y, r + margin_x, b + margin_y
+                if l < left or t < top or r > right or b > bottom:
+                    left, top, right, bottom = min(l, left), min(t, top), max(r, right), max(b, bottom)
+                    grown = True
+        return max(0, int(left)), max(0, int(top)), min(width, int(right)), min(height, int(bottom))
+
+    def __tiling_regions(self, region):
+        """
+        Regiões a serem divididas em mosaico: regiões de interesse configuradas,
+        recortadas pela região de movimento
+        :param region: região de movimento (left, top, right, bottom) ou None
+        :return: lista de regiões ou None para o quadro inteiro
+        """
+        if region is None:
+            return self.__detection_regions
+        if self.__detection_regions is None:
+            return [region]
+        left, top, right, bottom = region
+        regions = list()
+        for (l, t, r, b) in self.__detection_regions:
+            l, t, r, b = max(l, left), max(t, top), min(r, right), min(b, bottom)
+            if r > l and b > t:
+                regions.append((l, t, r, b))
+        return regions
+
+    def __detect_people(self, frame, width, height, region=None):
+        """
+        Detecção de pessoas no quadro inteiro ou apenas na região de movimento
+        :param frame: quadro RGB
+        :param width: largura do quadro
+        :param height: altura do quadro
+        :param region: região de movimento (left, top, right, bottom) ou None
+        :return: caixas delimitadoras em coordenadas do quadro
+        """
+        if self.__tiled_detection:
+            classes, names, centroids, bboxes, scores = self.__object_detector.run_tiled_detector(
+                frame,
+                width,
+                height,
+                tile_size=self.__tile_size,
+                overlap=self.__tile_overlap,
+                regions=self.__tiling_regions(region))
+        elif region is None:
             classes, names, centroids, bboxes, scores = self.__object_detector.run_detector(frame.copy(),
                                                                                             width,
                                                                                             height)
-            # nom max suppression
+        else:
+            left, top, right, bottom = region
+            classes, names, centroids, bboxes, scores = self.__object_detector.run_detector(
+                frame[top:bottom, left:right].copy(),
+                right - left,
+                bottom - top)
+            bboxes = [[l + left, t + top, r + left, b + top] for (l, t, r, b) in bboxes]
+
+        # nom max suppression
+        with self.__tracer.span('non_max_suppression', boxes=len(bboxes)):
             maintainboxes = non_max_suppression(np.array(bboxes), 0.1, np.array(scores))
 
-            bboxes = self.__box_cleanup(bboxes, maintainboxes)
+        bboxes = self.__box_cleanup(bboxes, maintainboxes)
 
-            # rastreamento
+        # pessoas paradas fora da região de movimento continuam rastreadas
 
-            tracks, bboxes = self.__tracker.update_tracks(bboxes)
+        if region is not None:
+            bboxes.extend([bbox for objectID, bbox in self.__static_tracks(region)])
 
-            # separando as áreas de interesse
+        return bboxes
 
-            image_crops = crop_bb(frame, bboxes)
+    def __estimate_poses(self, frame, bboxes):
+        """
+        Estimação de postura - por objeto rastreado
+        :param frame: quadro RGB
+        :param bboxes: caixas delimitadoras por rastreio
+        :return: poses, pose_position
+        """
 
-            poses = list()
+        # separando as áreas de interesse
 
-            pose_position = OrderedDict()
+        image_crops = crop_bb(frame, bboxes)
 
-            # estimação de postura - por objeto
+        poses = list()
 
-            for i in image_crops.keys():
-                image = image_crops[i]
+        pose_position = OrderedDict()
 
-                bbox = bboxes[i]
+        for i in image_crops.keys():
+            image = image_crops[i]
 
-                offset_width = bbox[0]
+            bbox = bboxes[i]
 
-                offset_height = bbox[1]
+            offset_width = bbox[0]
 
-                im_height, im_width = image.shape[:2]
+            offset_height = bbox[1]
 
+            im_height, im_width = image.shape[:2]
+
+            with self.__tracer.span('pose', track_id=int(i), crop_width=im_width, crop_height=im_height):
                 pose = self.__pose_estimator.run_estimator(image,
                                                            offset_width,
                                                            offset_height,
                                                            im_width,
                                                            im_height)
 
-                mpose = {"track_id": i,
-                         "keypoints_with_scores": pose.get_raw_points().flatten()}
+            mpose = {"track_id": i,
+                     "keypoints_with_scores": pose.get_raw_points().flatten()}
+
+            poses.append(mpose)
+
+            pose_position[i] = pose.get_points()
+
+        return poses, pose_position
+
+    def __estimate_multipose(self, frame, width, height, region=None):
+        """
+        Detecção e estimação de postura de todas as pessoas em uma única inferência
+        (Movenet Multipose) - as caixas alimentam diretamente o rastreador
+        :param frame: quadro RGB
+        :param width: largura do quadro
+        :param height: altura do quadro
+        :param region: região de movimento (left, top, right, bottom) ou None
+        :return: tracks, bboxes, poses, pose_position
+        """
+        if region is None:
+            estimates = self.__pose_estimator.run_multipose_estimator(frame, 0, 0, width, height)
+        else:
+            left, top, right, bottom = region
+            estimates = self.__pose_estimator.run_multipose_estimator(frame[top:bottom, left:right],
+                                                                      left,
+                                                                      top,
+                                                                      right - left,
+                                                                      bottom - top)
+        boxes = estimates.get_boxes()
+
+        points = estimates.get_points()
+
+        # pessoas paradas fora da região de movimento mantém caixa e postura anteriores
+
+        if region is not None:
+            static_tracks = self.__static_tracks(region)
+            if len(static_tracks) > 0:
+                boxes = np.concatenate((boxes, np.array([bbox for objectID, bbox in static_tracks])))
+                points = np.concatenate((points,
+                                         np.array([self.__pose_position[objectID]
+                                                   for objectID, bbox in static_tracks])))
+
+        # rastreamento
+
+        tracks, bboxes = self.__tracker.update_tracks(boxes)
+
+        detections = self.__tracker.detections
+
+        poses = list()
+
+        pose_position = OrderedDict()
+
+        for objectID in tracks.keys():
+            if objectID in detections:
+                pose_position[objectID] = points[detections[objectID]]
+            else:
+                # rastreio sem detecção neste quadro: mantém a última postura conhecida
+                pose_position[objectID] = self.__pose_position[objectID]
+
+            left, top = bboxes[objectID][:2]
+
+            raw_points = pose_position[objectID] - np.array([top, left, 0])
+
+            poses.append({"track_id": objectID,
+                          "keypoints_with_scores": raw_points.flatten()})
+
+        return tracks, bboxes, poses, pose_position
+
+    def __record(self, timestamp, tracks, bboxes, pose_position):
+        """
+        Grava os rastreios do quadro atual no arquivo de posturas
+        :param timestamp: instante do quadro
+        :param tracks: rastreios ativos
+        :param bboxes: caixas delimitadoras por rastreio
+        :param pose_position: pontos chave por rastreio
+        :return: None
+        """
+        track_ids = list(tracks.keys())
+        if len(track_ids) == 0:
+            return
+        self.__archive.append(timestamp,
+                              track_ids,
+                              np.array([bboxes[i] for i in track_ids]),
+                              np.array([pose_position[i] for i in track_ids]))
+
+    def get_motion_skip_ratio(self):
+        """
+        Fração de quadros em que a detecção foi pulada pelo portão de movimento
+        :return: razão entre quadros pulados e quadros processados
+        """
+        if self.__motion_gate is None:
+            return 0.0
+        return self.__motion_gate.get_skip_ratio()
+
+    def run(self):
+
+        try:
+            while self.__capture_device.isOpened():
+                self.__tracer.begin_frame()
+                # Lendo o frame atual
+                with self.__tracer.span('capture'):
+                    ret, frame = self.__capture_device.read()
+                if not ret:
+                    break
+                timestamp = time.time()
+                width = int(self.__capture_device.get(cv.CAP_PROP_FRAME_WIDTH))  # float `width`
+                height = int(self.__capture_device.get(cv.CAP_PROP_FRAME_HEIGHT))  # float `height`
+                # Convertendo o frame para RGB
+
+                frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+
+                # portão de movimento: cena parada e rastreios estáveis não precisam de nova inferência
+
+                skip, region = False, None
+
+                if self.__motion_gate is not None:
+                    with self.__tracer.span('motion_gate') as span:
+                        skip, region = self.__motion_gate.process(frame, self.__tracker.is_stable())
+                        if region is not None:
+                            region = self.__track_region(region, width, height)
+                        span.set(skip=skip, region=region)
+
+                if skip:
+                    tracks, bboxes = self.__tracker.objects, self.__tracker.bboxes
+                elif self.__pose_mode == 'multipose':
+                    with self.__tracer.span('multipose') as span:
+                        tracks, bboxes, self.__poses, self.__pose_position = self.__estimate_multipose(frame,
+                                                                                                        width,
+                                                                                                        height,
+                                                                                                        region)
+                        span.set(persons=len(tracks))
+                else:
+                    with self.__tracer.span('detection', tiled=self.__tiled_detection) as span:
+                        bboxes = self.__detect_people(frame, width, height, region)
+                        span.set(persons=len(bboxes))
+
+                    # rastreamento
+
+                    with self.__tracer.span('tracking'):
+                        tracks, bboxes = self.__tracker.update_tracks(bboxes)
+
+                    with self.__tracer.span('pose_estimation', persons=len(bboxes)):
+                        self.__poses, self.__pose_position = self.__estimate_poses(frame, bboxes)
+
+                poses = self.__poses
+
+                pose_position = self.__pose_position
+
+                # imprimindo os rastreios e detecçoes - seriam as entradas do classificador de postura
+
+                print(poses)
+
+                if self.__archive is not None:
+                    with self.__tracer.span('archive'):
+                        self.__record(timestamp, tracks, bboxes, pose_position)
+
+                # classificação de postura, classificação de movimentos e lógica de alarmes
+
+                track_ids = list(tracks.keys())
+
+                with self.__tracer.span('posture_classification', persons=len(track_ids)):
+                    labels, alarms = self.__posture_classifier.run_classifier(timestamp,
+                                                                              track_ids,
+                                                                              [pose_position[i] for i in track_ids],
+                                                                              [bboxes[i] for i in track_ids],
+                                                                              height)
+
+                postures = dict(zip(track_ids, labels))
+
+                for (objectID, alarm) in alarms:
+                    print("ALARME: {} - ID {}".format(alarm, objectID))
+
+                if self.__result_bus is not None:
+                    with self.__tracer.span('result_bus'):
+                        self.__result_bus.publish(timestamp,
+                                                  track_ids,
+                                                  [bboxes[i] for i in track_ids],
+                                                  [pose_position[i] for i in track_ids],
+                                                  labels)
 
-                poses.append(mpose)
+                # O importante term,inou - agora vem as frescurinhas de desenhar a tela
 
-                pose_position[i] = pose.get_points()
+                with self.__tracer.span('draw'):
+                    for (objectID, centroid) in tracks.items():
+                        text = "ID {} - {}".format(objectID, posture_name(postures[objectID]))
+                        left, top, right, bottom = bboxes[objectID]
+                        draw_rectangle(left, top, right, bottom, frame, label=text)
 
-            # imprimindo os rastreios e detecçoes - seriam as entradas do classificador de postura
+                        draw_keypoints(frame, pose_position[objectID], 0.1)
 
-            print(poses)
+                        draw_connections(frame, pose_position[objectID], 0.1)
 
-            # ainda falta: classificação de postura, classificação de movimentos e lógica de alarmes -
-            # isto deixo pra vocês!!!!
+                    # Convertendo o frame de volta para BGR
+                    frame = cv.cvtColor(frame, cv.COLOR_RGB2BGR)
 
-            # O importante term,inou - agora vem as frescurinhas de desenhar a tela
+                # Mostrando o frame processado
 
-            for (objectID, centroid) in tracks.items():
-                text = "ID {}".format(objectID)
-                left, top, right, bottom = bboxes[objectID]
-                draw_rectangle(left, top, right, bottom, frame, label=text)
+                with self.__tracer.span('display'):
+                    cv.imshow('Video', frame)
+                    key = cv.waitKey(1) & 0xFF
 
-                draw_keypoints(frame, pose_position[objectID], 0.1)
+                self.__tracer.end_frame(persons=len(tracks), skipped=skip)
 
-                draw_connections(frame, pose_position[objectID], 0.1)
+                if key == ord('q'):
+                    break
+        finally:
+            # grava registros, rastreamento e perfis mesmo se o laço for interrompido
+            self.__tracer.close()
 
-            # Convertendo o frame de volta para BGR
-            frame = cv.cvtColor(frame, cv.COLOR_RGB2BGR)
-            # Mostrando o frame processado
+            if self.__result_bus is not None:
+                self.__result_bus.close()
 
-            cv.imshow('Video', frame)
-            if cv.waitKey(1) & 0xFF == ord('q'):
-                break
+            # por último: relata uma falha de gravação do arquivo de posturas
+            if self.__archive is not None:
+                self.__archive.close()
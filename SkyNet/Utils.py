@@ -2,6 +2,7 @@ import tensorflow as tf
 import cv2 as cv
 import numpy as np
 from collections import OrderedDict
+from SkyNet.Profiling.Tracer import NULL_TRACER
 
 
 def preprocess(frame, img_size):
@@ -27,6 +28,86 @@ def preprocess(frame, img_size):
     return image_tensor
 
 
+def invoke_batch(interpreter, input_batch, get_outputs, tracer=NULL_TRACER, span_prefix='model'):
+    """
+    Inferência em lote: uma única invocação do interpretador para N imagens
+    :param interpreter: tf.lite.Interpreter
+    :param input_batch: array [N, input_height, input_width, 3]
+    :param get_outputs: função (interpreter, output_details) -> tupla de saídas
+    :param tracer: Tracer para o rastreamento de desempenho
+    :param span_prefix: prefixo dos intervalos do rastreamento
+    :return: tupla de saídas, com N na primeira dimensão
+    """
+    input_details = interpreter.get_input_details()
+
+    # só realoca os tensores quando o tamanho do lote muda
+    if tuple(input_details[0]['shape']) != input_batch.shape:
+        interpreter.resize_tensor_input(input_details[0]['index'], input_batch.shape)
+        with tracer.span(span_prefix + '.allocate_tensors', batch_size=len(input_batch)):
+            interpreter.allocate_tensors()
+
+    output_details = interpreter.get_output_details()
+
+    interpreter.set_tensor(input_details[0]['index'], input_batch)
+
+    with tracer.span(span_prefix + '.invoke', batch_size=len(input_batch)):
+        interpreter.invoke()
+
+    return get_outputs(interpreter, output_details)
+
+
+class BatchInterpreter:
+    """
+    Interpretador dedicado a lotes de tamanho variável. Se o modelo não aceitar lotes
+    maiores que 1 (ex.: pós-processamento do SSD em TFLite), passa a fazer uma
+    invocação por imagem
+    """
+
+    def __init__(self, interpreter_file, get_outputs, tracer=NULL_TRACER, span_prefix='model'):
+        """
+        Inicialização da classe
+        :param interpreter_file: o arquivo do modelo
+        :param get_outputs: função (interpreter, output_details) -> tupla de saídas
+        :param tracer: Tracer para o rastreamento de desempenho
+        :param span_prefix: prefixo dos intervalos do rastreamento
+        """
+        self.__interpreter_file = interpreter_file
+        self.__get_outputs = get_outputs
+        self.__tracer = tracer
+        self.__span_prefix = span_prefix
+        self.__interpreter = None
+        self.__batch_supported = True
+
+    def __new_interpreter(self):
+        self.__interpreter = tf.lite.Interpreter(model_path=self.__interpreter_file)
+        self.__interpreter.allocate_tensors()
+
+    def __invoke(self, batch):
+        return invoke_batch(self.__interpreter, batch, self.__get_outputs, self.__tracer, self.__span_prefix)
+
+    def run(self, batch):
+        """
+        Roda o lote
+        :param batch: imagens [N, input_size, input_size, 3]
+        :return: tupla de saídas, com N na primeira dimensão
+        """
+        if self.__interpreter is None:
+            self.__new_interpreter()
+
+        if self.__batch_supported:
+            try:
+                outputs = self.__invoke(batch)
+                if len(outputs[0]) == len(batch):
+                    return outputs
+            except (RuntimeError, ValueError):
+                pass
+            self.__batch_supported = False
+            self.__new_interpreter()
+
+        results = [self.__invoke(batch[i:i + 1]) for i in range(len(batch))]
+        return tuple(np.concatenate(result) for result in zip(*results))
+
+
 def crop_bb(frame, raw_dets):
     crops = OrderedDict()
     im_height, im_width = frame.shape[:2]
@@ -42,6 +123,71 @@ def crop_bb(frame, raw_dets):
     return crops
 
 
+def tile_starts(start, length, tile, overlap):
+    """
+    Posições iniciais dos ladrilhos ao longo de um eixo, distribuídas de forma
+    uniforme para cobrir exatamente o intervalo
+    :param start: início do intervalo
+    :param length: comprimento do intervalo
+    :param tile: comprimento do ladrilho
+    :param overlap: fração mínima de sobreposição entre ladrilhos vizinhos, em [0, 1)
+    :return: lista de posições iniciais
+    """
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError("A sobreposição dos ladrilhos deve estar em [0, 1): {}".format(overlap))
+    if length <= tile:
+        return [start]
+    stride = tile * (1.0 - overlap)
+    count = int(np.ceil((length - tile) / stride)) + 1
+    return [start + int(round(i * (length - tile) / (count - 1))) for i in range(count)]
+
+
+def grow_interval(start, end, length, limit):
+    """
+    Aumenta um intervalo até o comprimento dado, em torno do seu centro, deslocando-o
+    para dentro de [0, limit] quando necessário
+    :param start: início do intervalo
+    :param end: fim do intervalo
+    :param length: comprimento mínimo desejado - não maior que limit
+    :param limit: fim do eixo (largura ou altura do quadro)
+    :return: (start, end)
+    """
+    if end - start >= length:
+        return start, end
+    start = int(round((start + end - length) / 2.0))
+    start = min(max(0, start), limit - length)
+    return start, start + length
+
+
+def tile_regions(region, width, height, tile_size, overlap=0.2):
+    """
+    Divide uma região em ladrilhos quadrados sobrepostos. Regiões mais estreitas que
+    o ladrilho são aumentadas em torno do centro, dentro do quadro, para que o
+    ladrilho continue quadrado e o detector não receba uma imagem distorcida
+    :param region: região (left, top, right, bottom)
+    :param width: largura do quadro
+    :param height: altura do quadro
+    :param tile_size: lado do ladrilho - limitado ao menor lado do quadro
+    :param overlap: fração mínima de sobreposição entre ladrilhos vizinhos, em [0, 1)
+    :return: lista de ladrilhos (left, top, right, bottom)
+    """
+    if tile_size <= 0:
+        raise ValueError("O lado do ladrilho deve ser positivo: {}".format(tile_size))
+    left, top, right, bottom = [int(x) for x in region]
+    left, top = max(0, left), max(0, top)
+    right, bottom = min(width, right), min(height, bottom)
+    if right <= left or bottom <= top:
+        return []
+    tile = min(tile_size, width, height)
+    left, right = grow_interval(left, right, tile, width)
+    top, bottom = grow_interval(top, bottom, tile, height)
+    tiles = list()
+    for y in tile_starts(top, bottom - top, tile, overlap):
+        for x in tile_starts(left, right - left, tile, overlap):
+            tiles.append((x, y, x + tile, y + tile))
+    return tiles
+
+
 def non_max_suppression(boxes,
                         max_bbox_overlap,
                         scores=None):
@@ -0,0 +1,5 @@
+from SkyNet.Server.InferenceServer import InferenceServer
+
+server = InferenceServer()
+
+server.run(host='127.0.0.1', port=8080)
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import threading
+import cv2 as cv
+import numpy as np
+import pytest
+from SkyNet.Server import InferenceServer as server_module
+from SkyNet.Server.InferenceServer import InferenceServer
+
+
+class StubPose:
+
+    def __init__(self, points):
+        self.__points = points
+
+    def get_points(self):
+        return self.__points
+
+
+class StubObjectDetector:
+    """
+    Detector fictício: uma pessoa no quadrante superior esquerdo de cada quadro
+    """
+
+    def __init__(self, input_size, interpreter_file=None):
+        pass
+
+    def run_batch_detector(self, frames):
+        detections = list()
+        for frame in frames:
+            height, width = frame.shape[:2]
+            detections.append(([0], ['Pessoa'], [[width / 4.0, height / 4.0]],
+                               [[0, 0, width // 2, height // 2]], [0.9]))
+        return detections
+
+
+class StubPoseEstimation:
+    """
+    Estimador fictício - `release` permite segurar a thread de inferência
+    """
+
+    started = None
+
+    release = None
+
+    def __init__(self, input_size, interpreter_file=None):
+        pass
+
+    def run_batch_estimator(self, frames, offsets):
+        StubPoseEstimation.started.set()
+        StubPoseEstimation.release.wait(5)
+        return [StubPose(np.zeros((17, 3))) for _ in frames]
+
+
+@pytest.fixture(autouse=True)
+def stub_models(monkeypatch):
+    StubPoseEstimation.started = threading.Event()
+    StubPoseEstimation.release = threading.Event()
+    StubPoseEstimation.release.set()
+    monkeypatch.setattr(server_module, 'ObjectDetector', StubObjectDetector)
+    monkeypatch.setattr(server_module, 'PoseEstimation', StubPoseEstimation)
+
+
+def encode_image(width=64, height=48):
+    return cv.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+async def request(port, method, path, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = '{} {} HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(method, path, len(body))
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, payload = response.partition(b'\r\n\r\n')
+    return int(status_line.split()[1]), json.loads(payload)
+
+
+def run_with_server(scenario, **kwargs):
+    async def main():
+        server = InferenceServer(**kwargs)
+        asyncio_server = await server.start(port=0)
+        port = asyncio_server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_requests_are_micro_batched():
+    async def scenario(server, port):
+        return await asyncio.gather(*[request(port, 'POST', '/detect', encode_image()) for _ in range(4)])
+
+    responses = run_with_server(scenario, batch_window=0.2, max_batch_size=8)
+
+    for status, payload in responses:
+        assert status == 200
+        assert payload['batch_size'] > 1
+        assert payload['boxes'] == [[0, 0, 32, 24]]
+        assert len(payload['keypoints']) == 1
+        assert set(payload['latency_ms']) == {'decode', 'queue', 'inference', 'total'}
+
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario(server, port):
+        loop = asyncio.get_running_loop()
+        StubPoseEstimation.release.clear()
+
+        # a primeira requisição segura a thread de inferência, a segunda ocupa a fila
+        first = asyncio.ensure_future(request(port, 'POST', '/pose', encode_image()))
+        assert await loop.run_in_executor(None, StubPoseEstimation.started.wait, 5)
+        second = asyncio.ensure_future(request(port, 'POST', '/pose', encode_image()))
+        for _ in range(500):
+            if server.get_stats()['queue_size'] == 1:
+                break
+            await asyncio.sleep(0.01)
+
+        rejected = await request(port, 'POST', '/pose', encode_image())
+
+        StubPoseEstimation.release.set()
+        return rejected, await first, await second, server.get_stats()
+
+    rejected, first, second, stats = run_with_server(scenario, max_queue_size=1, max_batch_size=1)
+
+    assert rejected[0] == 503
+    assert first[0] == 200
+    assert second[0] == 200
+    assert stats['rejected'] == 1
+
+
+@pytest.mark.parametrize('body', [b'', b'not an image'])
+def test_invalid_image_returns_400(body):
+    async def scenario(server, port):
+        return await request(port, 'POST', '/detect', body)
+
+    status, payload = run_with_server(scenario)
+
+    assert status == 400
+    assert payload['error'] == 'imagem inválida'
+
+
+def test_stats():
+    async def scenario(server, port):
+        await asyncio.gather(*[request(port, 'POST', '/pose', encode_image()) for _ in range(3)])
+        return await request(port, 'GET', '/stats')
+
+    status, stats = run_with_server(scenario, batch_window=0.2)
+
+    assert status == 200
+    assert stats['requests'] == 3
+    assert stats['rejected'] == 0
+    assert stats['batches'] >= 1
+    assert stats['mean_batch_size'] == 3 / stats['batches']
+    assert set(stats['latency_ms']) == {'p50', 'p95', 'p99'}
@@ -0,0 +1,106 @@
+import cv2 as cv
+import numpy as np
+from SkyNet import SkyNet as skynet_module
+from SkyNet.SkyNet import SkyNet
+
+WIDTH, HEIGHT = 1280, 720
+
+PERSON = (400, 100, 600, 600)
+
+HAND = (470, 150, 530, 210)
+
+
+class StubCapture:
+    """
+    Câmera fictícia: uma pessoa parada (retângulo branco) em um fundo preto
+    """
+
+    def __init__(self, capture_device, frames=13):
+        self.__frames = frames
+        self.__frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        l, t, r, b = PERSON
+        self.__frame[t:b, l:r] = 255
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        pass
+
+    def get(self, prop):
+        return WIDTH if prop == cv.CAP_PROP_FRAME_WIDTH else HEIGHT
+
+    def read(self):
+        if self.__frames == 0:
+            return False, None
+        self.__frames -= 1
+        return True, self.__frame.copy()
+
+
+class StubMotionGate:
+    """
+    Portão fictício: quadro inteiro no primeiro quadro, depois só a mão acenando
+    """
+
+    def __init__(self, max_skip_frames=None):
+        self.__first = True
+
+    def process(self, frame, tracks_stable=True):
+        if self.__first:
+            self.__first = False
+            return False, None
+        return False, HAND
+
+    def get_skip_ratio(self):
+        return 0.0
+
+
+class StubObjectDetector:
+    """
+    Detector fictício: só encontra a pessoa se ela estiver inteira na imagem recebida
+    """
+
+    def __init__(self, input_size, interpreter_file=None, tracer=None):
+        pass
+
+    def run_detector(self, frame, width, height):
+        ys, xs = np.nonzero(frame[:, :, 0])
+        if len(xs) == 0 or xs.min() == 0 or ys.min() == 0 or xs.max() == width - 1 or ys.max() == height - 1:
+            return [], [], [], [], []
+        box = [int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1]
+        return [0], ['Pessoa'], [[(box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0]], [box], [0.9]
+
+
+class StubPose:
+
+    def get_points(self):
+        return np.zeros((17, 3))
+
+    def get_raw_points(self):
+        return np.zeros((1, 1, 17, 3))
+
+
+class StubPoseEstimation:
+
+    def __init__(self, input_size, interpreter_file=None, tracer=None):
+        pass
+
+    def run_estimator(self, frame, offset_width, offset_height, width, height):
+        return StubPose()
+
+
+def test_motion_inside_tracked_person_keeps_the_track(monkeypatch, capsys):
+    monkeypatch.setattr(cv, 'VideoCapture', StubCapture)
+    monkeypatch.setattr(cv, 'imshow', lambda *args: None)
+    monkeypatch.setattr(cv, 'waitKey', lambda *args: 0)
+    monkeypatch.setattr(skynet_module, 'MotionGate', StubMotionGate)
+    monkeypatch.setattr(skynet_module, 'ObjectDetector', StubObjectDetector)
+    monkeypatch.setattr(skynet_module, 'PoseEstimation', StubPoseEstimation)
+
+    skynet = SkyNet(motion_gating=True)
+    skynet.run()
+
+    # 12 quadros só com a mão em movimento - mais que o maxDisappeared do rastreador
+    tracker = skynet._SkyNet__tracker
+    assert [list(bbox) for bbox in tracker.bboxes.values()] == [list(PERSON)]
+    assert max(tracker.disappeared.values()) == 0
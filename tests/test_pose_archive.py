@@ -0,0 +1,116 @@
+import shutil
+import time
+import numpy as np
+import pytest
+from SkyNet.Recording.PoseArchive import PoseArchiveWriter, PoseArchiveReader
+
+
+def write_frames(writer, frames, track_ids=(0, 1, 2), t0=0.0):
+    """
+    Grava `frames` quadros, um por segundo, com uma pessoa por rastreio - os valores
+    das caixas e pontos chave codificam (quadro, rastreio) para conferir a leitura
+    """
+    for frame in range(frames):
+        boxes = np.array([[frame, track_id, frame + 10, track_id + 10] for track_id in track_ids])
+        keypoints = np.empty((len(track_ids), 17, 3))
+        keypoints[:, :, 0] = frame
+        keypoints[:, :, 1] = np.array(track_ids)[:, None]
+        keypoints[:, :, 2] = 0.5
+        writer.append(t0 + frame, list(track_ids), boxes, keypoints)
+
+
+def test_round_trip_across_chunks(tmp_path):
+    with PoseArchiveWriter(str(tmp_path), chunk_records=10, flush_interval=None) as writer:
+        write_frames(writer, 20)
+
+    reader = PoseArchiveReader(str(tmp_path))
+
+    # 60 registros, bloco fechado ao passar de 10 (4 quadros): cada consulta atravessa vários blocos
+    assert len(list(tmp_path.glob('chunk_*.poses'))) == 5
+    assert list(reader.get_track_ids()) == [0, 1, 2]
+    assert reader.get_time_range() == (0.0, 19.0)
+
+    records = reader.read(track_id=1)
+    np.testing.assert_array_equal(records['timestamp'], np.arange(20))
+    np.testing.assert_array_equal(records['track_id'], 1)
+    np.testing.assert_array_equal(records['box'][:, 0], np.arange(20))
+    np.testing.assert_array_equal(records['keypoints'][:, 0, 0], np.arange(20))
+    np.testing.assert_array_equal(records['keypoints'][:, :, 1], 1)
+
+    for view in reader.query(t_start=3.5, t_end=12):
+        assert len(np.unique(view['track_id'])) == 1
+        assert np.all(np.diff(view['timestamp']) > 0)
+
+    records = reader.read(t_start=3.5, t_end=12)
+    assert len(records) == 9 * 3
+    assert records['timestamp'].min() == 4 and records['timestamp'].max() == 12
+
+    assert len(reader.read(track_id=2, t_start=19, t_end=19)) == 1
+    assert len(reader.read(track_id=7)) == 0
+    assert len(reader.read(t_start=100)) == 0
+
+
+def test_read_with_few_open_chunks(tmp_path):
+    with PoseArchiveWriter(str(tmp_path), chunk_records=3, flush_interval=None) as writer:
+        write_frames(writer, 30)
+
+    reader = PoseArchiveReader(str(tmp_path), max_open_chunks=2)
+
+    np.testing.assert_array_equal(reader.read(track_id=0)['timestamp'], np.arange(30))
+    assert len(reader.read()) == 90
+
+
+def test_reopened_directory_keeps_runs_apart(tmp_path):
+    with PoseArchiveWriter(str(tmp_path), chunk_records=10, flush_interval=None) as writer:
+        write_frames(writer, 5)
+
+    reader = PoseArchiveReader(str(tmp_path))
+
+    # o rastreador recomeça em 0: os ids da nova execução vêm depois dos já gravados
+    with PoseArchiveWriter(str(tmp_path), chunk_records=10, flush_interval=None) as writer:
+        write_frames(writer, 5, t0=100.0)
+        assert writer.get_track_offset() == 3
+
+    assert len(reader.read()) == 15
+    reader.refresh()
+
+    assert list(reader.get_track_ids()) == [0, 1, 2, 3, 4, 5]
+    np.testing.assert_array_equal(reader.read(track_id=2)['timestamp'], np.arange(5))
+    np.testing.assert_array_equal(reader.read(track_id=5)['timestamp'], 100 + np.arange(5))
+    assert reader.get_time_range() == (0.0, 104.0)
+
+
+def test_reopened_directory_requires_the_same_format(tmp_path):
+    PoseArchiveWriter(str(tmp_path), keypoint_dtype='float16').close()
+
+    with pytest.raises(ValueError):
+        PoseArchiveWriter(str(tmp_path), keypoint_dtype='float32')
+
+
+def test_pending_records_are_flushed_periodically(tmp_path):
+    writer = PoseArchiveWriter(str(tmp_path), flush_interval=0.05)
+    write_frames(writer, 3)
+
+    reader = PoseArchiveReader(str(tmp_path))
+    for _ in range(200):
+        reader.refresh()
+        if len(reader.read()) == 9:
+            break
+        time.sleep(0.01)
+
+    assert len(reader.read()) == 9
+    writer.close()
+
+
+def test_write_failure_is_reported(tmp_path):
+    directory = tmp_path / 'poses'
+    writer = PoseArchiveWriter(str(directory), chunk_records=2, flush_interval=None, queue_size=2)
+    shutil.rmtree(str(directory))
+
+    # a thread de gravação falha no primeiro bloco; append não pode bloquear com a fila cheia
+    with pytest.raises(RuntimeError):
+        write_frames(writer, 100)
+
+    with pytest.raises(RuntimeError) as error:
+        writer.close()
+    assert isinstance(error.value.__cause__, OSError)
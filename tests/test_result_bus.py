@@ -0,0 +1,124 @@
+import multiprocessing
+import uuid
+import numpy as np
+import pytest
+from multiprocessing import shared_memory, resource_tracker
+from SkyNet.ResultBus.ResultBus import ResultBusWriter, ResultBusReader, record_people
+from SkyNet.ResultBus.ResultBus import RECORDS_OFFSET, frame_record_dtype
+
+
+def publish_frames(writer, frames, people=2, t0=0.0):
+    for frame in range(frames):
+        track_ids = np.arange(people)
+        boxes = np.full((people, 4), frame)
+        keypoints = np.full((people, 17, 3), frame)
+        writer.publish(t0 + frame, track_ids, boxes, keypoints, postures=track_ids + 1)
+
+
+def read_in_subprocess(name, results):
+    with ResultBusReader(name, from_start=True) as reader:
+        records = reader.poll()
+        results.put((records['seq'].tolist(),
+                     records['timestamp'].tolist(),
+                     [record_people(record)[0].tolist() for record in records],
+                     reader.get_dropped()))
+
+
+@pytest.fixture
+def bus_name():
+    return 'skynet_test_{}'.format(uuid.uuid4().hex[:12])
+
+
+def test_poll_from_another_process(bus_name):
+    with ResultBusWriter(bus_name, slots=8) as writer:
+        publish_frames(writer, 5)
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=read_in_subprocess, args=(bus_name, results))
+        process.start()
+        seqs, timestamps, track_ids, dropped = results.get(timeout=30)
+        process.join(30)
+
+        assert process.exitcode == 0
+        assert seqs == [1, 2, 3, 4, 5]
+        assert timestamps == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert track_ids == [[0, 1]] * 5
+        assert dropped == 0
+
+        # o leitor que terminou não pode ter removido o segmento
+        with ResultBusReader(bus_name, from_start=True) as reader:
+            assert len(reader.poll()) == 5
+
+
+def test_new_reader_only_sees_new_frames(bus_name):
+    with ResultBusWriter(bus_name) as writer:
+        publish_frames(writer, 3)
+
+        with ResultBusReader(bus_name) as reader:
+            assert len(reader.poll()) == 0
+            publish_frames(writer, 2, t0=10.0)
+
+            records = reader.poll()
+            assert records['seq'].tolist() == [4, 5]
+            assert records['timestamp'].tolist() == [10.0, 11.0]
+
+            track_ids, postures, boxes, keypoints = record_people(records[0])
+            assert track_ids.tolist() == [0, 1]
+            assert postures.tolist() == [1, 2]
+            np.testing.assert_array_equal(boxes, 0)
+            assert keypoints.shape == (2, 17, 3)
+
+
+def test_poll_respects_max_records(bus_name):
+    with ResultBusWriter(bus_name) as writer, ResultBusReader(bus_name) as reader:
+        publish_frames(writer, 5)
+
+        assert reader.poll(max_records=2)['seq'].tolist() == [1, 2]
+        assert reader.poll()['seq'].tolist() == [3, 4, 5]
+        assert reader.get_next_seq() == 6
+
+
+def test_overrun_reader_counts_dropped_frames(bus_name):
+    with ResultBusWriter(bus_name, slots=4) as writer, ResultBusReader(bus_name) as reader:
+        publish_frames(writer, 10)
+
+        records = reader.poll()
+
+        assert records['seq'].tolist() == [7, 8, 9, 10]
+        assert reader.get_dropped() == 6
+
+    with ResultBusWriter(bus_name, slots=4) as writer:
+        publish_frames(writer, 10)
+        with ResultBusReader(bus_name, from_start=True) as reader:
+            assert reader.poll()['seq'].tolist() == [7, 8, 9, 10]
+            assert reader.get_dropped() == 0
+
+
+def test_record_being_written_is_discarded(bus_name, monkeypatch):
+    with ResultBusWriter(bus_name, slots=4) as writer, ResultBusReader(bus_name) as reader:
+        publish_frames(writer, 3)
+
+        # o escritor zera o número de sequência do slot enquanto o regrava
+        monkeypatch.setattr(resource_tracker, 'register', lambda name, rtype: None)
+        memory = shared_memory.SharedMemory(name=bus_name)
+        records = np.ndarray((4,), dtype=frame_record_dtype(), buffer=memory.buf, offset=RECORDS_OFFSET)
+        records['seq'][1] = 0
+
+        assert reader.poll()['seq'].tolist() == [1, 3]
+        assert reader.get_dropped() == 1
+
+        del records
+        memory.close()
+
+
+def test_frames_with_more_than_max_people_are_truncated(bus_name):
+    with ResultBusWriter(bus_name, max_people=2) as writer, ResultBusReader(bus_name) as reader:
+        publish_frames(writer, 1, people=5)
+        writer.publish(1.0, [], np.empty((0, 4)), np.empty((0, 17, 3)))
+
+        records = reader.poll()
+
+        assert records['count'].tolist() == [2, 0]
+        assert record_people(records[0])[0].tolist() == [0, 1]
+        assert len(record_people(records[1])[0]) == 0
@@ -0,0 +1,52 @@
+import numpy as np
+from SkyNet.ObjectDetection import ObjectDetector as detector_module
+from SkyNet.ObjectDetection.ObjectDetector import ObjectDetector
+from SkyNet.Utils import non_max_suppression
+
+WIDTH, HEIGHT = 1280, 720
+
+# mais alta que um ladrilho de 400 px: aparece cortada em todos os ladrilhos que a contém
+PERSON = (300, 150, 420, 650)
+
+
+class StubBatchInterpreter:
+    """
+    SSD fictício: encontra o retângulo branco de cada imagem do lote. Pessoas cortadas
+    pela borda da imagem recebem score maior que as inteiras, como acontece com o SSD
+    real em recortes parciais
+    """
+
+    def __init__(self, interpreter_file, get_outputs, tracer=None, span_prefix='model'):
+        pass
+
+    def run(self, batch):
+        classes = np.zeros((len(batch), 1))
+        boxes = np.zeros((len(batch), 1, 4))
+        scores = np.zeros((len(batch), 1))
+        for i, image in enumerate(batch):
+            size = image.shape[0]
+            ys, xs = np.nonzero(image[:, :, 0])
+            if len(xs) == 0:
+                continue
+            boxes[i, 0] = [ys.min() / size, xs.min() / size, (ys.max() + 1) / size, (xs.max() + 1) / size]
+            cut = xs.min() == 0 or ys.min() == 0 or xs.max() == size - 1 or ys.max() == size - 1
+            scores[i, 0] = 0.95 if cut else 0.6
+        return classes, boxes, scores
+
+
+def test_person_spanning_tiles_keeps_the_complete_box(monkeypatch):
+    monkeypatch.setattr(detector_module.tf.lite, 'Interpreter', lambda model_path: None)
+    monkeypatch.setattr(detector_module, 'BatchInterpreter', StubBatchInterpreter)
+
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    l, t, r, b = PERSON
+    frame[t:b, l:r] = 255
+
+    detector = ObjectDetector(300, 'ssd.tflite')
+    classes, names, centroids, boxes, scores = detector.run_tiled_detector(frame, WIDTH, HEIGHT,
+                                                                           tile_size=400,
+                                                                           overlap=0.2)
+    keep = non_max_suppression(np.array(boxes), 0.1, np.array(scores))
+
+    assert len(keep) == 1
+    np.testing.assert_allclose(boxes[keep[0]], PERSON, atol=6)